@@ -3,12 +3,25 @@ import json
 import pandas as pd
 from datetime import datetime
 from source.api import fetch_historical_data
-from flask import Flask, render_template, request, jsonify, stream_with_context, Response
+from flask import Flask, render_template, request, jsonify, stream_with_context, Response, g
 from source.models.arimax_forecast import arimax_forecast
-from source.models.xgboost_forecast import xgboost_forecast, train_live_model, predict_usd_realtime
-from source.api import fetch_historical_data, fetch_live_data
+from source.models.xgboost_forecast import xgboost_forecast, train_live_model, predict_usd_realtime, forecast_future_steps
+from source.api import fetch_historical_data
+from source.candle_store import is_store, load_frame
+from source.pyramid import can_derive, ensure_aggregate, fetch_aggregate, update_pyramid
+from source.batch import run_batch, process_pair
+from source.price_hub import subscribe, unsubscribe
+from source.features import BASE_FEATURES
+from source.metrics import timed, observe, render as render_metrics
+from source.jobs import submit_job, get_job, wait_for_job, queue_metrics, file_fingerprint
+from source import snapshots
+from source.refresher import start_refresher
+from source import columnar
+from source.time_index import get_index, to_epoch_seconds, MODES
+from source.downsample import downsample, METHODS as DOWNSAMPLE_METHODS
 import os 
 import time
+import queue
 import logging
 from joblib import load
 from dotenv import load_dotenv
@@ -27,6 +40,38 @@ logging.info("Logging is configured. Application starting.")
 app = Flask(__name__)
 CORS(app)
 
+SNAPSHOT_MODELS = [m for m in os.getenv('SNAPSHOT_MODELS', 'xgboost,arimax').split(',') if m]
+SNAPSHOT_HISTORY_LIMIT = int(os.getenv('SNAPSHOT_HISTORY_LIMIT', 30))
+SNAPSHOT_STEPS = int(os.getenv('SNAPSHOT_STEPS', 10))
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.before_request
+def start_background_workers():
+    # Started on the first request so the debug reloader's parent process never runs them
+    pairs = snapshots.tracked_pairs()
+    if not pairs:
+        return
+    api_key = os.getenv('CRYPTOCOMPARE_API_KEY')
+    if api_key:
+        for symbol, currency in pairs:
+            start_refresher(api_key, symbol, currency)
+    snapshots.start_scheduler(pairs, refresh_snapshots, lambda symbol, currency: file_fingerprint(data_path(symbol, currency)))
+
+@app.after_request
+def record_request_duration(response):
+    started = getattr(g, 'request_started', None)
+    if started is not None:
+        observe('http_request_duration_seconds', time.perf_counter() - started,
+                endpoint=request.endpoint or 'unknown', method=request.method, status=response.status_code)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -44,14 +89,30 @@ def fetch_data():
 
             logging.info(f"Fetching data for {symbol} in {currency} with {aggregate}-minute aggregation, {days_back} days back.")
 
-            df = fetch_historical_data(symbol, currency, aggregate, limit, days_back)
+            now = int(time.time())
+            if can_derive(symbol, currency, aggregate, since=now - days_back * 24 * 60 * 60, until=now - 2 * aggregate * 60):
+                # Finer candles already cover the window: resample them instead of downloading
+                df = load_frame(ensure_aggregate(symbol, currency, aggregate), start=now - days_back * 24 * 60 * 60).reset_index()
+                logging.info(f"Data for {symbol} at {aggregate}m derived from stored candles.")
+            else:
+                api_key = os.getenv('CRYPTOCOMPARE_API_KEY')
+                if not api_key:
+                    return jsonify({"error": "CRYPTOCOMPARE_API_KEY not set in environment"}), 500
+
+                # Download the base series when it divides the request, so every level can be derived
+                source = fetch_aggregate(aggregate)
+                # fetch_historical_data writes both the candle store and the CSV file
+                df = fetch_historical_data(api_key, symbol, currency, source, limit, days_back)
+                logging.info(f"Data for {symbol} saved to data/crypto_data_{symbol}_{currency}_{days_back}d.csv.")
+                if df is not None and not df.empty and source != aggregate:
+                    df = load_frame(ensure_aggregate(symbol, currency, aggregate), start=now - days_back * 24 * 60 * 60).reset_index()
             if df is None or df.empty:
                 logging.warning(f"No data available for {symbol} in {currency}.")
                 return jsonify({"error": f"No data available for {symbol} in {currency}."}), 400
 
-            filename = f'data/crypto_data_{symbol}_{currency}_{days_back}d.csv'
-            df.to_csv(filename, index=False)
-            logging.info(f"Data for {symbol} saved to {filename}.")
+            update_pyramid(symbol, currency)
+            snapshots.invalidate(symbol, currency)
+            snapshots.notify()
 
             data_preview = df.head(5).to_dict(orient='records')
             return jsonify({
@@ -89,9 +150,23 @@ def predict():
     if predictions.empty:
         return jsonify({'error': 'The model returned no predictions. Check the data or model configuration.'}), 400
 
-    predictions['time'] = predictions['time'].dt.strftime('%Y-%m-%d %H:%M:%S') 
+    try:
+        max_points, method = chart_params(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    predictions = downsample(predictions, max_points, method)
+
+    media_type = columnar.negotiate(request.accept_mimetypes)
+    if media_type != columnar.JSON:
+        with timed('serialize', endpoint='predict'):
+            encoding = columnar.negotiate_encoding(request.accept_encodings)
+            body = render_body(predictions, {'metrics': metrics}, None, media_type, encoding)
+        return columnar_response(body, media_type, encoding)
 
-    predictions_list = predictions.to_dict(orient='records')
+    with timed('serialize', endpoint='predict'):
+        predictions['time'] = predictions['time'].dt.strftime('%Y-%m-%d %H:%M:%S') 
+
+        predictions_list = predictions.to_dict(orient='records')
 
     #For debug reasons
     #prediction_data = [
@@ -102,7 +177,8 @@ def predict():
 
     #print(predictions_list[:5])
 
-    return render_template('predictions.html', model_choice=model_choice, predictions=predictions_list, metrics=metrics)
+    with timed('render', endpoint='predict'):
+        return render_template('predictions.html', model_choice=model_choice, predictions=predictions_list, metrics=metrics)
 
 @app.route('/realtime', methods=['GET'])
 def realtime():
@@ -118,42 +194,88 @@ def stream_realtime():
         raise RuntimeError("CRYPTOCOMPARE_API_KEY not set in environment")
 
     def generate():
-        for live_data in fetch_live_data(api_key=api_key, symbol=symbol, currency=currency, interval=5):
-            try:
-                print(f"Live data received: {live_data}")
-                # Only keep time and price
-                filtered_data = {
-                    'time': live_data.get('time'),
-                    currency: live_data.get(currency) or live_data.get('USD')
-                }
-                yield f"data: {json.dumps(filtered_data)}\n\n"
-            except Exception as e:
-                print(f"Unexpected Error: {e}")
-                yield f"data: {json.dumps({'error': 'Unexpected error during streaming'})}\n\n"
-            finally:
-                time.sleep(1)
+        subscriber = subscribe(api_key, symbol, currency, interval=5)
+        try:
+            while True:
+                try:
+                    tick = subscriber.get(timeout=15)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if tick is None:
+                    yield f"data: {json.dumps({'error': 'Client too slow, stream closed'})}\n\n"
+                    return
+                yield f"data: {json.dumps(tick)}\n\n"
+        finally:
+            unsubscribe(symbol, currency, subscriber)
 
     return Response(stream_with_context(generate()), content_type='text/event-stream')
 
-@app.route('/extract_value', methods=['GET'])
+@app.route('/extract_value', methods=['GET', 'POST'])
 def extract_current_value():
-    query_time = request.args.get('query_time')
-    if not query_time:
-        return jsonify({'error': 'query_time parameter is required.'}), 400
+    """
+    Look up close prices by time with a binary search over the pair's sorted time index.
+
+    GET ?query_time=... (repeatable) or POST {"query_times": [...]}; `mode` is exact (default),
+    nearest or asof. GET ?start=...&end=... returns every candle in that range instead.
+    A single query_time keeps the original {'time', 'close'} response; several return a list.
+    """
+    params = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    symbol = params.get('symbol', 'ETH')
+    currency = params.get('currency', 'USD')
+    aggregate = int(params.get('aggregate', 10))
+    mode = params.get('mode', 'exact')
+    if mode not in MODES:
+        return jsonify({'error': f'mode must be one of {", ".join(MODES)}.'}), 400
+
+    if request.method == 'POST':
+        query_times = params.get('query_times') or []
+    else:
+        query_times = request.args.getlist('query_time')
+    start, end = params.get('start'), params.get('end')
+    if not query_times and not (start or end):
+        return jsonify({'error': 'query_time (or start/end) parameter is required.'}), 400
+
+    file_path = data_path(symbol, currency, aggregate)
+    if file_path is None:
+        return data_not_found(symbol, currency, aggregate, file_path)
+    if not os.path.exists(file_path):
+        file_path = 'crypto_data.csv'
 
     try:
-        df = pd.read_csv('crypto_data.csv')
-        df['time'] = pd.to_datetime(df['time'])
-        query_time = pd.to_datetime(query_time)
-        current_value = df[df['time'] == query_time]
-
-        if not current_value.empty:
-            close_price = current_value['close'].values[0]
-            return jsonify({'time': query_time, 'close': close_price})
-        else:
-            return jsonify({'error': f'No data found for the time {query_time}'}), 404
+        with timed('load', endpoint='extract_value'):
+            index = get_index(file_path)
+
+        if not query_times:
+            rows = index.range(to_epoch_seconds(start)[0] if start else None, to_epoch_seconds(end)[0] if end else None)
+            return jsonify({'values': [
+                {'time': format_epoch(t), 'close': c} for t, c in zip(index.times[rows].tolist(), index.close[rows].tolist())
+            ]})
+
+        positions = index.locate(to_epoch_seconds(query_times), mode)
+
+        if len(query_times) == 1 and request.method == 'GET':
+            position = int(positions[0])
+            if position < 0:
+                return jsonify({'error': f'No data found for the time {pd.to_datetime(query_times[0])}'}), 404
+            matched = pd.Timestamp(int(index.times[position]), unit='s')
+            return jsonify({'time': matched, 'close': float(index.close[position])})
+
+        results = []
+        for query_time, position in zip(query_times, positions.tolist()):
+            if position < 0:
+                results.append({'query_time': query_time, 'error': 'No data found'})
+            else:
+                results.append({'query_time': query_time, 'time': format_epoch(index.times[position]),
+                                'close': float(index.close[position])})
+        return jsonify({'results': results})
+    except FileNotFoundError:
+        return jsonify({'error': f'Data file {file_path} not found.'}), 404
     except Exception as e:
         return jsonify({'error': f'An error occurred: {e}'}), 500
+
+def format_epoch(seconds):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(int(seconds)))
     
 
 @app.route('/api/predict/arimax', methods=['POST'])
@@ -161,77 +283,320 @@ def predict_arimax():
     data = request.get_json()
     symbol = data.get('symbol', 'ETH')
     currency = data.get('currency', 'USD')
-    steps = int(data.get('steps', 10))
-    file_path = f'data/crypto_data_{symbol}_{currency}_30d.csv'
+    steps = parse_steps(data.get('steps', 10))
+    if steps is None:
+        return jsonify({'error': 'steps must be a positive integer.'}), 400
+    aggregate = int(data.get('aggregate', 10))
+    file_path = data_path(symbol, currency, aggregate)
 
-    if not os.path.exists(file_path):
-        return jsonify({'error': f'Data file {file_path} not found.'}), 404
+    if file_path is None or not os.path.exists(file_path):
+        return data_not_found(symbol, currency, aggregate, file_path)
 
-    df = pd.read_csv(file_path)
-    df = add_features(df)
-    df = df.dropna()
-    df.to_csv('debug_arimax_features.csv', index=False)  # For debugging
+    if data.get('async'):
+        return submit_training_job('arimax', symbol, currency, steps, file_path)
 
-    # Use the improved arimax_forecast (assume it uses all features)
-    result, metrics = arimax_forecast(file_path)
-    # For now, intervals are not implemented
-    predictions = result[['time', 'predicted']].tail(steps).to_dict(orient='records')
-    return jsonify({
-        'predictions': predictions,
-        'intervals': [],
-        'metrics': metrics
-    })
+    try:
+        max_points, method = chart_params(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def build():
+        frame, meta = prediction_frame('arimax', file_path, steps)
+        return downsample(frame, max_points, method), meta
+
+    key = ('predict', symbol, currency, 'arimax', steps, aggregate) + chart_key(max_points, method)
+    return serve_snapshot(key, file_path, build, prediction_payload)
 
 @app.route('/api/predict/xgboost', methods=['POST'])
 def predict_xgboost():
     data = request.get_json()
     symbol = data.get('symbol', 'ETH')
     currency = data.get('currency', 'USD')
-    steps = int(data.get('steps', 10))
-    file_path = f'data/crypto_data_{symbol}_{currency}_30d.csv'
+    steps = parse_steps(data.get('steps', 10))
+    if steps is None:
+        return jsonify({'error': 'steps must be a positive integer.'}), 400
+    aggregate = int(data.get('aggregate', 10))
+    file_path = data_path(symbol, currency, aggregate)
+
+    if file_path is None or not os.path.exists(file_path):
+        return data_not_found(symbol, currency, aggregate, file_path)
+
+    if data.get('async'):
+        return submit_training_job('xgboost', symbol, currency, steps, file_path)
+
+    try:
+        max_points, method = chart_params(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    def build():
+        frame, meta = prediction_frame('xgboost', file_path, steps)
+        return downsample(frame, max_points, method), meta
+
+    key = ('predict', symbol, currency, 'xgboost', steps, aggregate) + chart_key(max_points, method)
+    return serve_snapshot(key, file_path, build, prediction_payload)
 
+def prediction_frame(model_choice, file_path, steps):
+    """Forecast `steps` candles; returns the time/predicted frame and the response fields besides it."""
+    if model_choice == 'arimax':
+        # Use the improved arimax_forecast (assume it uses all features)
+        result, metrics = arimax_forecast(file_path)
+        result = result.tail(steps)
+    else:
+        # Direct multi-horizon model: one prediction per future step after the last candle
+        result, metrics = forecast_future_steps(file_path, steps=steps)
+    # For now, intervals are not implemented
+    return result[['time', 'predicted']], {'intervals': [], 'metrics': metrics}
+
+def prediction_payload(frame, meta):
+    return {'predictions': frame.to_dict(orient='records'), **meta}
+
+@app.route('/api/batch', methods=['POST'])
+def predict_batch():
+    """
+    Fetch and/or forecast many pairs at once. Results are streamed as NDJSON, one line per pair,
+    in the order they complete.
+    """
+    data = request.get_json() or {}
+    pairs = [(p.get('symbol', 'ETH'), p.get('currency', 'USD')) for p in data.get('pairs', [])]
+    if not pairs:
+        return jsonify({'error': 'pairs must be a non-empty list of {"symbol", "currency"} objects.'}), 400
+
+    model_choice = data.get('model_choice', 'xgboost')
+    steps = parse_steps(data.get('steps', 10))
+    if steps is None:
+        return jsonify({'error': 'steps must be a positive integer.'}), 400
+    aggregate = int(data.get('aggregate', 10))
+    fetch = bool(data.get('fetch', False))
+    max_workers = max(1, min(int(data.get('max_workers', 4)), 16))
+
+    api_key = os.getenv('CRYPTOCOMPARE_API_KEY')
+    if fetch and not api_key:
+        return jsonify({'error': 'CRYPTOCOMPARE_API_KEY not set in environment'}), 500
+
+    logging.info(f"Batch request for {len(pairs)} pairs with model {model_choice}, fetch={fetch}.")
+
+    def generate():
+        for result in run_batch(pairs, data_path, max_workers=max_workers, model_choice=model_choice,
+                                steps=steps, fetch=fetch, api_key=api_key, aggregate=aggregate):
+            yield json.dumps(result) + "\n"
+
+    return Response(stream_with_context(generate()), content_type='application/x-ndjson')
+
+def submit_training_job(model_choice, symbol, currency, steps, file_path):
+    """Queue a forecast on the training pool and answer 202 with the job id."""
+    key = (model_choice, symbol, currency, steps, file_fingerprint(file_path))
+    job = submit_job(
+        lambda: process_pair(symbol, currency, lambda *_: file_path, model_choice=model_choice, steps=steps),
+        key, model=model_choice, symbol=symbol, currency=currency,
+    )
+    logging.info(f"Training job {job['id']} for {symbol}/{currency} with {model_choice} is {job['status']}.")
+    return jsonify({'job_id': job['id'], 'status': job['status']}), 202
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    data = request.get_json() or {}
+    model_choice = data.get('model_choice', 'xgboost')
+    symbol = data.get('symbol', 'ETH')
+    currency = data.get('currency', 'USD')
+    steps = parse_steps(data.get('steps', 10))
+    if steps is None:
+        return jsonify({'error': 'steps must be a positive integer.'}), 400
+    if model_choice not in ('arimax', 'xgboost'):
+        return jsonify({'error': 'Invalid model choice. Choose "arimax" or "xgboost".'}), 400
+
+    file_path = data_path(symbol, currency)
     if not os.path.exists(file_path):
         return jsonify({'error': f'Data file {file_path} not found.'}), 404
+    return submit_training_job(model_choice, symbol, currency, steps, file_path)
+
+@app.route('/api/jobs/metrics', methods=['GET'])
+def job_metrics():
+    return jsonify(queue_metrics())
 
-    df = pd.read_csv(file_path)
-    df = add_features(df)
-    df = df.dropna()
-    df.to_csv('debug_xgboost_features.csv', index=False)  # For debugging
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    wait = float(request.args.get('wait', 0))
+    job = wait_for_job(job_id, timeout=min(wait, 30)) if wait > 0 else get_job(job_id)
+    if job is None:
+        return jsonify({'error': f'Job {job_id} not found.'}), 404
+    return jsonify(job)
 
-    # Use the improved xgboost_forecast (assume it uses all features)
-    result, metrics = xgboost_forecast(file_path)
-    predictions = result[['time', 'predicted']].tail(steps).to_dict(orient='records')
-    return jsonify({
-        'predictions': predictions,
-        'intervals': [],
-        'metrics': metrics
-    })
+@app.route('/api/jobs/<job_id>/stream', methods=['GET'])
+def job_stream(job_id):
+    if get_job(job_id) is None:
+        return jsonify({'error': f'Job {job_id} not found.'}), 404
+
+    def generate():
+        last_status = None
+        while True:
+            job = wait_for_job(job_id, timeout=5)
+            if job is None:
+                return
+            if job['status'] != last_status:
+                last_status = job['status']
+                yield f"data: {json.dumps(job)}\n\n"
+            if job['status'] in ('done', 'failed'):
+                return
+
+    return Response(stream_with_context(generate()), content_type='text/event-stream')
+
+def parse_steps(value):
+    """Forecast horizon from a request value, or None unless it is a positive integer."""
+    try:
+        steps = int(value)
+    except (TypeError, ValueError):
+        return None
+    return steps if steps >= 1 else None
+
+LEGACY_CSV_AGGREGATE = 10
+
+def data_path(symbol, currency, aggregate=10):
+    """
+    Prefer the candle store series for a pair (derived from finer stored candles when it does
+    not exist yet) and fall back to the legacy CSV file, which only holds 10-minute candles.
+    Returns None when no data at `aggregate` minutes can be served.
+    """
+    path = ensure_aggregate(symbol, currency, aggregate)
+    if path:
+        return path
+    if aggregate != LEGACY_CSV_AGGREGATE:
+        return None
+    return f'data/crypto_data_{symbol}_{currency}_30d.csv'
+
+def data_not_found(symbol, currency, aggregate, file_path):
+    """404 response for a missing data file, or for an aggregate data_path cannot serve."""
+    if file_path is None:
+        return jsonify({'error': f'No {aggregate}-minute data for {symbol}/{currency}: no stored candles it can be derived from.'}), 404
+    return jsonify({'error': f'Data file {file_path} not found.'}), 404
+
+def read_candles(path, last=None):
+    """Read candles with a 'time' column from either the candle store or a CSV file."""
+    if is_store(path):
+        return load_frame(path, last=last).reset_index()
+    df = pd.read_csv(path)
+    return df if last is None else df.tail(last)
 
 def add_features(df):
-    df['close_lag1'] = df['close'].shift(1)
-    df['close_lag2'] = df['close'].shift(2)
-    df['rolling_mean_5'] = df['close'].rolling(window=5).mean()
-    df['rolling_std_5'] = df['close'].rolling(window=5).std()
-    # Add more indicators as needed
-    return df
+    # Lags and rolling stats come from the shared feature engine; add more specs there as needed
+    return BASE_FEATURES.add_to(df)
 
 @app.route('/api/history', methods=['GET'])
 def get_history():
     symbol = request.args.get('symbol', 'ETH')
     currency = request.args.get('currency', 'USD')
     limit = int(request.args.get('limit', 30))
-    file_path = f'data/crypto_data_{symbol}_{currency}_30d.csv'
+    aggregate = int(request.args.get('aggregate', 10))
+    file_path = data_path(symbol, currency, aggregate)
 
-    if not os.path.exists(file_path):
-        return jsonify({'error': f'Data file {file_path} not found.'}), 404
+    if file_path is None or not os.path.exists(file_path):
+        return data_not_found(symbol, currency, aggregate, file_path)
+
+    try:
+        max_points, method = chart_params(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    df = pd.read_csv(file_path)
+    def build():
+        frame, meta = history_frame(file_path, limit)
+        return downsample(frame, max_points, method), meta
+
+    key = ('history', symbol, currency, limit, aggregate) + chart_key(max_points, method)
+    return serve_snapshot(key, file_path, build, history_payload)
+
+def history_frame(file_path, limit):
+    with timed('load', endpoint='api_history'):
+        df = read_candles(file_path, last=limit)
     df = df.dropna(subset=['time', 'close'])
-    # Get the last `limit` rows
-    recent = df.tail(limit)
-    # Return time and actual close price
-    history = recent[['time', 'close']].rename(columns={'close': 'actual'}).to_dict(orient='records')
-    return jsonify({'history': history})
+    # Get the last `limit` rows: time and actual close price
+    recent = df.tail(limit)[['time', 'close']].rename(columns={'close': 'actual'})
+    recent['time'] = pd.to_datetime(recent['time'])
+    return recent, {}
+
+def history_payload(frame, meta):
+    frame = frame.assign(time=frame['time'].dt.strftime('%Y-%m-%d %H:%M:%S'))
+    return {'history': frame.to_dict(orient='records'), **meta}
+
+def chart_params(params):
+    """
+    Read the max_points / downsample (lttb or minmax) parameters. max_points=None means the
+    full series is returned.
+    """
+    max_points = int(params.get('max_points') or 0) or None
+    method = params.get('downsample', 'lttb')
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f'downsample must be one of {", ".join(DOWNSAMPLE_METHODS)}.')
+    if max_points is not None and max_points < 3:
+        raise ValueError('max_points must be at least 3.')
+    return max_points, method
+
+def chart_key(max_points, method):
+    # Empty for full series so the keys precomputed by refresh_snapshots still match
+    return (('max_points', max_points, method),) if max_points else ()
+
+def render_body(frame, meta, to_json, media_type, encoding=None):
+    """Serialize a response either as the legacy JSON records (to_json) or in a columnar format."""
+    if media_type == columnar.JSON:
+        return app.json.dumps(to_json(frame, meta)).encode()
+    with timed('encode', media_type=media_type):
+        body = columnar.encode(columnar.frame_columns(frame), media_type, meta)
+        return columnar.compress(body, encoding)
+
+def columnar_response(body, media_type, encoding, status=200):
+    response = Response(body, status=status, content_type=media_type)
+    if encoding and status != 304:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.update(('Accept', 'Accept-Encoding'))
+    return response
+
+def serve_snapshot(key, file_path, build, to_json):
+    """
+    Answer from the precomputed snapshot for `key` while the data file is unchanged, with
+    ETag/Last-Modified validators (304 when the client copy is current). On a miss build()
+    returns (frame, meta), which is serialized once in the format negotiated from the Accept and
+    Accept-Encoding headers and stored for the next request.
+    """
+    media_type = columnar.negotiate(request.accept_mimetypes)
+    encoding = None if media_type == columnar.JSON else columnar.negotiate_encoding(request.accept_encodings)
+    key = key + (media_type, encoding)
+
+    fingerprint = file_fingerprint(file_path)
+    snapshot = snapshots.get(key, fingerprint)
+    if snapshot is None:
+        frame, meta = build()
+        snapshot = snapshots.put(key, render_body(frame, meta, to_json, media_type, encoding), fingerprint)
+
+    # Validators are checked by hand: make_conditional ignores them on POST, which the predict endpoints use
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(snapshot['etag'])
+    else:
+        since = request.if_modified_since
+        not_modified = since is not None and int(snapshot['last_modified']) <= since.timestamp()
+
+    response = columnar_response(b'' if not_modified else snapshot['body'], media_type, encoding,
+                                 status=304 if not_modified else 200)
+    response.set_etag(snapshot['etag'])
+    response.last_modified = snapshot['last_modified']
+    response.cache_control.no_cache = True
+    return response
+
+def refresh_snapshots(symbol, currency):
+    """Precompute the history window and the forecasts the dashboard polls for one pair."""
+    file_path = data_path(symbol, currency)
+    fingerprint = file_fingerprint(file_path)
+    if fingerprint is None:
+        return
+    # Only the default JSON variant is precomputed; columnar variants are stored on first request
+    variant = (columnar.JSON, None)
+    with app.app_context():
+        frame, meta = history_frame(file_path, SNAPSHOT_HISTORY_LIMIT)
+        snapshots.put(('history', symbol, currency, SNAPSHOT_HISTORY_LIMIT, 10) + variant,
+                      render_body(frame, meta, history_payload, columnar.JSON), fingerprint)
+        for model_choice in SNAPSHOT_MODELS:
+            frame, meta = prediction_frame(model_choice, file_path, SNAPSHOT_STEPS)
+            snapshots.put(('predict', symbol, currency, model_choice, SNAPSHOT_STEPS, 10) + variant,
+                          render_body(frame, meta, prediction_payload, columnar.JSON), fingerprint)
+    logging.info(f"Snapshots refreshed for {symbol}/{currency}.")
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5001)
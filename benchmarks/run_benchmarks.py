@@ -0,0 +1,185 @@
+"""
+Offline benchmark suite for the data and forecasting pipeline.
+
+Generates synthetic OHLCV candles, times each stage and records peak Python memory.
+Timings are taken with tracemalloc running, so they include its overhead; compare them only
+against baselines recorded the same way. No network access is needed.
+Results can be saved as a baseline and later runs compared against it; any stage slower than
+baseline * (1 + tolerance) makes the run exit with status 1.
+
+    python benchmarks/run_benchmarks.py --sizes 1000,10000 --save-baseline
+    python benchmarks/run_benchmarks.py --sizes 1000,10000
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def generate_candles(n_rows, seed=42, aggregate=10):
+    """Random-walk OHLCV candles in the CryptoCompare histominute layout."""
+    rng = np.random.default_rng(seed)
+    close = 3000 + np.cumsum(rng.normal(0, 5, n_rows))
+    spread = rng.random(n_rows) * 5
+    volumefrom = rng.random(n_rows) * 100
+    return pd.DataFrame({
+        'time': pd.date_range('2024-01-01', periods=n_rows, freq=f'{aggregate}min'),
+        'high': close + spread,
+        'low': close - spread,
+        'open': close + rng.normal(0, 1, n_rows),
+        'volumefrom': volumefrom,
+        'volumeto': volumefrom * close,
+        'close': close,
+    })
+
+
+def reset_caches():
+    """
+    Drop the fitted-model cache (which also holds the ARIMAX incremental state) and the response
+    snapshots, so a repeat times the handler rather than a cache lookup.
+    """
+    from source import model_cache, snapshots
+    model_cache.clear()
+    snapshots.invalidate()
+
+
+def measure(fn, repeat, setup=None):
+    """Run fn `repeat` times, calling `setup` untimed before each; return median seconds and peak traced memory in MiB."""
+    timings = []
+    peak = 0
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        tracemalloc.start()
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return statistics.median(timings), peak / (1024 * 1024)
+
+
+def build_stages(csv_path, store_dir, client):
+    """Stage name -> (callable, max rows it is run for by default)."""
+    from app import add_features
+    from source.models import arimax_forecast as arimax
+    from source.models import xgboost_forecast as xgbf
+
+    def grid_search():
+        target, exog = arimax.preprocess_data(arimax.load_data(csv_path))
+        train_target, _, train_exog, _ = arimax.split_data(target, exog)
+        arimax.grid_search_arimax(train_target, train_exog, p_range=(0, 3), d_range=(0, 2), q_range=(0, 3), n_jobs=1)
+
+    return {
+        'load_data_csv': (lambda: arimax.load_data(csv_path), None),
+        'load_data_store': (lambda: arimax.load_data(store_dir), None),
+        'add_features': (lambda: add_features(pd.read_csv(csv_path)), None),
+        'grid_search_arimax': (grid_search, 10_000),
+        'arimax_forecast': (lambda: arimax.arimax_forecast(csv_path, n_jobs=1, use_cache=False, incremental=False), 10_000),
+        'xgboost_forecast': (lambda: xgbf.xgboost_forecast(csv_path, use_cache=False), None),
+        'api_history': (lambda: client.get('/api/history?symbol=BENCH&currency=USD&limit=500'), None),
+        'api_predict_xgboost': (lambda: client.post('/api/predict/xgboost', json={'symbol': 'BENCH', 'currency': 'USD', 'steps': 10}), None),
+        'api_predict_arimax': (lambda: client.post('/api/predict/arimax', json={'symbol': 'BENCH', 'currency': 'USD', 'steps': 10}), 10_000),
+    }
+
+
+def run(sizes, stages=None, repeat=3, max_rows_override=False):
+    results = {}
+    workdir = tempfile.mkdtemp(prefix='bench_')
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    # Keep model caches inside the scratch directory so every run starts cold.
+    os.environ['MODEL_CACHE_DIR'] = os.path.join(workdir, 'cache')
+    try:
+        from source.candle_store import append_candles, store_path
+        import app
+        app.app.config['TESTING'] = True
+        client = app.app.test_client()
+
+        for n_rows in sizes:
+            shutil.rmtree('data', ignore_errors=True)
+            os.makedirs('data')
+            candles = generate_candles(n_rows)
+            csv_path = os.path.join('data', 'crypto_data_BENCH_USD_30d.csv')
+            candles.to_csv(csv_path, index=False)
+            store_dir = store_path('BENCH', 'USD', 10)
+            append_candles(store_dir, candles)
+
+            for name, (fn, max_rows) in build_stages(csv_path, store_dir, client).items():
+                if stages and name not in stages:
+                    continue
+                if max_rows and n_rows > max_rows and not max_rows_override:
+                    continue
+                seconds, peak_mib = measure(fn, repeat, setup=reset_caches)
+                results[f'{name}@{n_rows}'] = {'seconds': seconds, 'peak_mib': peak_mib}
+                print(f"{name:<22} {n_rows:>9} rows  {seconds * 1000:10.1f} ms  {peak_mib:8.1f} MiB", flush=True)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Return the list of stages slower than baseline * (1 + tolerance)."""
+    regressions = []
+    for key, current in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+        limit = reference['seconds'] * (1 + tolerance)
+        if current['seconds'] > limit:
+            regressions.append(f"{key}: {current['seconds']:.4f}s > {limit:.4f}s (baseline {reference['seconds']:.4f}s)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000', help='comma separated row counts')
+    parser.add_argument('--stages', default='', help='comma separated stage names (default: all)')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--all-sizes', action='store_true', help='also run ARIMAX stages above their 10k row default cap')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown relative to baseline')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    stages = {stage for stage in args.stages.split(',') if stage}
+    results = run(sizes, stages, args.repeat, args.all_sizes)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=4, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one.")
+        return 0
+
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    if regressions:
+        print("PERFORMANCE REGRESSIONS:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print("No regressions against baseline.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
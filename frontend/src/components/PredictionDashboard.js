@@ -5,6 +5,18 @@ import Container from '@mui/material/Container';
 
 const API_BASE_URL = process.env.REACT_APP_API_BASE_URL || 'http://localhost:5001';
 
+// Columnar responses: parallel arrays of epoch-ms times and values instead of one object per row
+const COLUMNAR_JSON = 'application/vnd.columnar+json';
+
+const fetchColumns = async (url, options = {}) => {
+  const response = await fetch(url, { ...options, headers: { ...(options.headers || {}), Accept: COLUMNAR_JSON } });
+  return response.json();
+};
+
+const emptyColumns = { time: [] };
+
+const formatTime = (ms) => new Date(ms).toISOString().slice(0, 16).replace('T', ' ');
+
 const models = [
   { value: 'arimax', label: 'ARIMAX' },
   { value: 'xgboost', label: 'XGBoost' }
@@ -26,48 +38,46 @@ export default function PredictionDashboard() {
   const [symbol, setSymbol] = useState('ETH');
   const [currency, setCurrency] = useState('USD');
   const [steps, setSteps] = useState(10);
-  const [predictions, setPredictions] = useState([]);
-  const [actuals, setActuals] = useState([]);
+  const [predictions, setPredictions] = useState(emptyColumns);
+  const [actuals, setActuals] = useState(emptyColumns);
   const [metrics, setMetrics] = useState(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState(null);
 
   const fetchActuals = async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/api/history?symbol=${symbol}&currency=${currency}&limit=30`);
-      const data = await response.json();
+      const data = await fetchColumns(`${API_BASE_URL}/api/history?symbol=${symbol}&currency=${currency}&limit=30`);
       if (data.error) {
         setError(data.error);
         return;
       }
-      setActuals(data.history || []);
+      setActuals(data.columns || emptyColumns);
     } catch (err) {
       setError('Failed to fetch historical data');
-      setActuals([]);
+      setActuals(emptyColumns);
     }
   };
 
   const fetchPredictions = async () => {
     setLoading(true);
     setError(null);
-    setPredictions([]);
+    setPredictions(emptyColumns);
     setMetrics(null);
     
     try {
       await fetchActuals();
-      const response = await fetch(`${API_BASE_URL}/api/predict/${model}`, {
+      const data = await fetchColumns(`${API_BASE_URL}/api/predict/${model}`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ symbol, currency, steps })
       });
-      const data = await response.json();
       
       if (data.error) {
         setError(data.error);
         return;
       }
       
-      setPredictions(data.predictions || []);
+      setPredictions(data.columns || emptyColumns);
       setMetrics(data.metrics || null);
     } catch (err) {
       setError('Failed to fetch predictions');
@@ -77,22 +87,20 @@ export default function PredictionDashboard() {
   };
 
   // Combine actuals and predictions for the chart
-  const actualMap = {};
-  actuals.forEach(a => { actualMap[a.time] = a.actual; });
-
-  const predictedMap = {};
-  predictions.forEach(p => { predictedMap[p.time] = p.predicted; });
-
-  const allTimes = Array.from(new Set([
-    ...actuals.map(a => a.time),
-    ...predictions.map(p => p.time)
-  ])).sort((a, b) => new Date(a) - new Date(b));
-
-  const combinedData = allTimes.map(time => ({
-    time,
-    actual: actualMap[time] !== undefined ? actualMap[time] : null,
-    predicted: predictedMap[time] !== undefined ? predictedMap[time] : null
-  }));
+  // Both series are sorted by time, so a single merge pass lines them up
+  const combinedData = [];
+  let i = 0;
+  let j = 0;
+  while (i < actuals.time.length || j < predictions.time.length) {
+    const a = i < actuals.time.length ? actuals.time[i] : Infinity;
+    const p = j < predictions.time.length ? predictions.time[j] : Infinity;
+    const time = Math.min(a, p);
+    combinedData.push({
+      time,
+      actual: a === time ? actuals.actual[i++] : null,
+      predicted: p === time ? predictions.predicted[j++] : null
+    });
+  }
 
   return (
     <Box sx={{ background: '#f4f6fa', minHeight: '100vh' }}>
@@ -180,6 +188,7 @@ export default function PredictionDashboard() {
                 <LineChart data={combinedData} margin={{ top: 20, right: 30, left: 0, bottom: 20 }}>
                   <XAxis 
                     dataKey="time" 
+                    tickFormatter={formatTime}
                     tick={{ fontSize: 12 }} 
                     angle={-30} 
                     textAnchor="end" 
@@ -192,7 +201,7 @@ export default function PredictionDashboard() {
                   />
                   <Tooltip 
                     formatter={(value) => [`$${value.toFixed(2)}`, '']}
-                    labelFormatter={(label) => `Time: ${label}`}
+                    labelFormatter={(label) => `Time: ${formatTime(label)}`}
                   />
                   <Legend verticalAlign="top" height={36} />
                   <Line 
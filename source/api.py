@@ -1,53 +1,181 @@
 import requests
+import requests.adapters
 import time
 import pandas as pd
 import json
-from datetime import datetime, timedelta, timezone
+from datetime import datetime, timezone
 import os
 from source.data_processing import load_and_process_data
+from source.metrics import inc
+from source.candle_store import append_candles, last_timestamp, store_path
 import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def fetch_historical_data(api_key, symbol='ETH', currency='USD', aggregate=10, limit=2000, days_back=30):
+API_BASE_URL = os.getenv('CRYPTOCOMPARE_API_URL', 'https://min-api.cryptocompare.com')
+
+_session = None
+
+def get_session(pool_size=16):
+    """
+    Returns the shared requests.Session so every CryptoCompare call reuses pooled connections.
+    """
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _session = session
+    return _session
+
+
+class RateLimitError(requests.exceptions.RequestException):
+    """Raised when CryptoCompare keeps rejecting requests after all retries."""
+
+
+def _get_json(session, url, params, max_retries=5, backoff=1.0):
+    """
+    GET a CryptoCompare endpoint, retrying with exponential backoff on rate limits and server errors.
+    """
+    for attempt in range(max_retries + 1):
+        response = session.get(url, params=params, timeout=30)
+        inc('upstream_api_calls_total', endpoint=url.rsplit('/', 1)[-1], status=response.status_code)
+        delay = backoff * (2 ** attempt)
+
+        if response.status_code == 429 or response.status_code >= 500:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+        else:
+            response.raise_for_status()
+            payload = response.json()
+            if payload.get('Response') != 'Error':
+                return payload
+            message = payload.get('Message', '')
+            if 'rate limit' not in message.lower():
+                raise ValueError(message)
+
+        if attempt < max_retries:
+            print(f"Rate limited or server error ({response.status_code}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+    raise RateLimitError(f"Giving up on {url} after {max_retries} retries")
+
+
+def _page_bounds(from_timestamp, to_timestamp, aggregate, limit):
+    """
+    Split [from_timestamp, to_timestamp] into (toTs, limit) pages, newest first.
+    Each histominute page returns limit + 1 candles ending at toTs.
+    """
+    step = aggregate * 60
+    span = limit * step
+    pages = []
+    page_to = to_timestamp
+    while page_to > from_timestamp:
+        page_limit = min(limit, -(-(page_to - from_timestamp) // step))
+        pages.append((page_to, page_limit))
+        page_to -= span
+    return pages
+
+
+def backfill_historical_data(api_key, symbol='ETH', currency='USD', aggregate=10, limit=2000, days_back=30,
+                             max_workers=4, on_page=None, base_url=None, session=None, to_timestamp=None,
+                             from_timestamp=None):
+    """
+    Fetches an arbitrary time range of histominute candles by splitting it into toTs pages
+    and downloading them concurrently with a bounded thread pool.
+
+    Pages are passed to `on_page` oldest first as soon as every older page has arrived, so the
+    caller can stream them into append-only storage. Overlapping candles are de-duplicated.
+    Returns a DataFrame sorted by time, or None if nothing was returned.
+    `from_timestamp` overrides the start of the range (default: `days_back` days before `to_timestamp`).
+    """
+    session = session or get_session()
+    url = f"{(base_url or API_BASE_URL).rstrip('/')}/data/v2/histominute"
+    if to_timestamp is None:
+        to_timestamp = int(datetime.now(timezone.utc).timestamp())
+    if from_timestamp is None:
+        from_timestamp = to_timestamp - days_back * 24 * 60 * 60
+
+    pages = _page_bounds(from_timestamp, to_timestamp, aggregate, limit)
+    pages.reverse()  # oldest first, the order pages are handed to storage
+    print(f"Backfilling {symbol}/{currency} in {len(pages)} page(s) with {max_workers} worker(s)")
+
+    def fetch_page(page_to, page_limit):
+        params = {
+            'fsym': symbol,
+            'tsym': currency,
+            'limit': page_limit,
+            'aggregate': aggregate,
+            'toTs': page_to,
+            'e': 'CCCAGG',
+            'api_key': api_key
+        }
+        return _get_json(session, url, params).get('Data', {}).get('Data', [])
+
+    frames = []
+    ready = {}
+    next_page = 0
+    last_time = None
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch_page, page_to, page_limit): i for i, (page_to, page_limit) in enumerate(pages)}
+        for future in as_completed(futures):
+            ready[futures[future]] = future.result()
+            while next_page in ready:
+                df = pd.DataFrame(ready.pop(next_page))
+                next_page += 1
+                if df.empty:
+                    continue
+                df = df[df['time'] >= from_timestamp]
+                if last_time is not None:
+                    df = df[df['time'] > last_time]
+                df = df.drop_duplicates(subset='time').sort_values(by='time')
+                if df.empty:
+                    continue
+                last_time = df['time'].iloc[-1]
+                df['time'] = pd.to_datetime(df['time'], unit='s')
+                if on_page is not None:
+                    on_page(df)
+                frames.append(df)
+
+    if not frames:
+        return None
+    return pd.concat(frames, ignore_index=True)
+
+
+def fetch_historical_data(api_key, symbol='ETH', currency='USD', aggregate=10, limit=2000, days_back=30, max_workers=4):
     """
     Fetches historical minute data for a single cryptocurrency from the specified time range.
-    Saves the data to a CSV file and returns a DataFrame.
+    Ranges longer than `limit` candles are backfilled page by page. Pages are streamed into the
+    candle store as they arrive; the full range is also saved to a CSV file and returned as a DataFrame.
+    The candle still in progress is not requested: the store never rewrites a stored candle, so
+    only final candles may go in (fetch_new_candles picks it up once it closes).
     """
-    to_timestamp = int(datetime.now(timezone.utc).timestamp())
-    from_timestamp = int((datetime.now(timezone.utc) - timedelta(days=days_back)).timestamp())
+    step = aggregate * 60
+    now = int(datetime.now(timezone.utc).timestamp())
+    to_timestamp = now - now % step - 1
+    from_timestamp = to_timestamp - days_back * 24 * 60 * 60
 
     print(f"Fetching data from {datetime.utcfromtimestamp(from_timestamp)} to {datetime.utcfromtimestamp(to_timestamp)}")
     print(f"Fetching data for symbol: {symbol}")
 
-    url = 'https://min-api.cryptocompare.com/data/v2/histominute'
-    params = {
-        'fsym': symbol,
-        'tsym': currency,
-        'limit': limit,
-        'aggregate': aggregate,
-        'toTs': to_timestamp,
-        'e': 'CCCAGG',  
-        'api_key': api_key
-    }
+    path = store_path(symbol, currency, aggregate)
 
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json().get('Data', {}).get('Data', [])
+        df = backfill_historical_data(api_key, symbol, currency, aggregate, limit, days_back,
+                                      max_workers=max_workers, to_timestamp=to_timestamp,
+                                      on_page=lambda page: append_candles(path, page))
 
-        if not data:
+        if df is None or df.empty:
             print(f"No data found for symbol {symbol}. The time range might be too large or the API might not support it.")
             return None
 
-        df = pd.DataFrame(data)
-        df['time'] = pd.to_datetime(df['time'], unit='s')
-        df.sort_values(by='time', inplace=True)  
-
         directory = 'data' 
         os.makedirs(directory, exist_ok=True) 
         filename = os.path.join(directory, f'crypto_data_{symbol}_{currency}_{days_back}d.csv')
         df.to_csv(filename, index=False)
 
-        print(f"Data for {symbol} saved to {filename}")
+        print(f"Data for {symbol} saved to {filename} and {path}")
         return df
 
     except requests.exceptions.HTTPError as http_err:
@@ -60,11 +188,35 @@ def fetch_historical_data(api_key, symbol='ETH', currency='USD', aggregate=10, l
         print(f"Unexpected error for {symbol}: {traceback.format_exc()}")  
     return None
 
+def fetch_new_candles(api_key, symbol='ETH', currency='USD', aggregate=10, limit=2000, days_back=30,
+                      max_workers=4, base_url=None, session=None):
+    """
+    Bring the candle store series for a pair up to date by requesting only candles newer than
+    the last stored one (the last `days_back` days for a new series). The candle still in
+    progress is left for the next run, so every stored candle is final.
+    Returns the number of candles appended.
+    """
+    path = store_path(symbol, currency, aggregate)
+    step = aggregate * 60
+    now = int(datetime.now(timezone.utc).timestamp())
+    to_timestamp = now - now % step - 1
+    last = last_timestamp(path)
+    from_timestamp = to_timestamp - days_back * 24 * 60 * 60 if last is None else last + step
+    if from_timestamp > to_timestamp:
+        return 0
+
+    written = []
+    backfill_historical_data(api_key, symbol, currency, aggregate, limit, days_back, max_workers=max_workers,
+                             base_url=base_url, session=session, to_timestamp=to_timestamp,
+                             from_timestamp=from_timestamp, on_page=lambda page: written.append(append_candles(path, page)))
+    return sum(written)
+
+
 def fetch_current_price(api_key, symbol='ETH', currency='USD'):
     """
     Fetches the current price of a cryptocurrency.
     """
-    url = 'https://min-api.cryptocompare.com/data/price'
+    url = f"{API_BASE_URL.rstrip('/')}/data/price"
     params = {
         'fsym': symbol,
         'tsyms': currency,
@@ -72,7 +224,8 @@ def fetch_current_price(api_key, symbol='ETH', currency='USD'):
     }
 
     try:
-        response = requests.get(url, params=params)
+        response = get_session().get(url, params=params, timeout=30)
+        inc('upstream_api_calls_total', endpoint='price', status=response.status_code)
         response.raise_for_status()
     except requests.exceptions.RequestException as e:
         print(f"Error fetching current price: {e}")
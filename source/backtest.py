@@ -0,0 +1,131 @@
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_squared_error, mean_absolute_error, median_absolute_error
+from source.models.arimax_forecast import load_data, grid_search_arimax, exog_scaler, fit_arimax_model, make_predictions
+from source.models.xgboost_forecast import XGBOOST_PARAM_GRID, grid_search_xgboost
+from source.models.linear_regression_forecast import create_lagged_features
+
+DATA_COLUMNS = ('close', 'volumefrom', 'volumeto', 'high', 'low')
+FEATURE_COLUMNS = list(DATA_COLUMNS[1:])
+
+
+def walk_forward_splits(n_rows, n_folds=5, test_size=None, min_train=None, window=None):
+    """
+    Walk-forward folds as (train_start, train_end, test_end) row positions.
+
+    The last n_folds * test_size rows are cut into consecutive test blocks. Each fold trains on
+    everything before its test block (expanding window) or on the `window` rows before it
+    (sliding window) when window is set.
+    """
+    if test_size is None:
+        test_size = max(1, n_rows // (2 * n_folds))
+    first_test = n_rows - n_folds * test_size
+    min_train = min_train or test_size
+    if first_test < min_train:
+        raise ValueError(f"{n_rows} rows are not enough for {n_folds} folds of {test_size} with {min_train} training rows.")
+
+    splits = []
+    for k in range(n_folds):
+        train_end = first_test + k * test_size
+        train_start = max(0, train_end - window) if window else 0
+        splits.append((train_start, train_end, train_end + test_size))
+    return splits
+
+
+def _fold_arimax(values, train, test, order=None, p_range=(0, 3), d_range=(0, 2), q_range=(0, 3)):
+    """Search (unless `order` is given) and fit the fold as arimax_forecast does, then forecast the test block."""
+    y, X = values[:, 0], values[:, 1:]
+    if order is None:
+        order = grid_search_arimax(pd.Series(y[train]), pd.DataFrame(X[train]), p_range, d_range, q_range)
+        if order is None:
+            raise ValueError(f"Every ARIMAX order candidate failed to fit on training rows {train.start}-{train.stop}.")
+    scaler = exog_scaler(X[train])
+    model_fit = fit_arimax_model(y[train], X[train], order, scaler=scaler)
+    return np.asarray(make_predictions(model_fit, X[test], scaler)), y[test]
+
+
+def _fold_xgboost(values, train, test, param_grid=None):
+    """Train the fold with the production search (XGBOOST_PARAM_GRID unless `param_grid` is given)."""
+    y, X = values[:, 0], values[:, 1:]
+    X_train = pd.DataFrame(X[train], columns=FEATURE_COLUMNS)
+    model = grid_search_xgboost(X_train, pd.Series(y[train]), param_grid=param_grid or XGBOOST_PARAM_GRID, nthread=1)
+    return model.predict(pd.DataFrame(X[test], columns=FEATURE_COLUMNS)), y[test]
+
+
+def _fold_linear(values, train, test, lags=3):
+    data = pd.DataFrame({'USD': values[train.start:test.stop, 0]})
+    data = create_lagged_features(data, 'USD', lags)
+    features = [f'USD_lag_{i}' for i in range(1, lags + 1)]
+    n_train = train.stop - train.start - lags
+    model = LinearRegression()
+    model.fit(data[features].iloc[:n_train], data['USD'].iloc[:n_train])
+    return model.predict(data[features].iloc[n_train:]), data['USD'].iloc[n_train:].values
+
+
+FOLD_MODELS = {
+    'arimax': _fold_arimax,
+    'xgboost': _fold_xgboost,
+    'linear': _fold_linear,
+}
+
+
+def _run_fold(dataset_dir, model, fold, train_start, train_end, test_end, model_kwargs):
+    """Worker entry point: memory-map the shared dataset, fit one fold and score it."""
+    values = np.load(os.path.join(dataset_dir, 'values.npy'), mmap_mode='r')
+    times = np.load(os.path.join(dataset_dir, 'time.npy'), mmap_mode='r')
+
+    started = time.perf_counter()
+    predictions, actual = FOLD_MODELS[model](values, slice(train_start, train_end), slice(train_end, test_end), **model_kwargs)
+    mse = mean_squared_error(actual, predictions)
+    return {
+        'fold': fold,
+        'train_start': pd.Timestamp(times[train_start]),
+        'test_start': pd.Timestamp(times[train_end]),
+        'test_end': pd.Timestamp(times[test_end - 1]),
+        'n_train': train_end - train_start,
+        'n_test': test_end - train_end,
+        'RMSE': float(np.sqrt(mse)),
+        'MSE': float(mse),
+        'MAE': float(mean_absolute_error(actual, predictions)),
+        'MdAE': float(median_absolute_error(actual, predictions)),
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def run_backtest(file_path, model='xgboost', n_folds=5, test_size=None, min_train=None, window=None, max_workers=None, **model_kwargs):
+    """
+    Walk-forward backtest of 'arimax', 'xgboost' or 'linear' over a CSV file or candle store series.
+
+    The dataset is written once to a temporary .npy file that every worker process memory-maps,
+    so folds run in parallel without each worker getting its own copy.
+    Returns one row of metrics per fold.
+    """
+    if model not in FOLD_MODELS:
+        raise ValueError(f"Unknown model {model!r}. Choose from {sorted(FOLD_MODELS)}.")
+
+    data = load_data(file_path)[list(DATA_COLUMNS)].dropna()
+    splits = walk_forward_splits(len(data), n_folds, test_size, min_train, window)
+
+    dataset_dir = tempfile.mkdtemp(prefix='backtest_')
+    try:
+        np.save(os.path.join(dataset_dir, 'values.npy'), np.ascontiguousarray(data.to_numpy(dtype=np.float64)))
+        np.save(os.path.join(dataset_dir, 'time.npy'), data.index.to_numpy(dtype='datetime64[ns]'))
+
+        with ProcessPoolExecutor(max_workers=max_workers or min(len(splits), os.cpu_count() or 1)) as executor:
+            futures = [
+                executor.submit(_run_fold, dataset_dir, model, fold, *split, model_kwargs)
+                for fold, split in enumerate(splits)
+            ]
+            results = [future.result() for future in futures]
+    finally:
+        shutil.rmtree(dataset_dir, ignore_errors=True)
+
+    folds = pd.DataFrame(results)
+    print(f"{model} walk-forward backtest over {len(folds)} folds: mean RMSE {folds['RMSE'].mean():.4f}")
+    return folds
@@ -0,0 +1,68 @@
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from source.api import fetch_historical_data
+from source.pyramid import ensure_aggregate, fetch_aggregate, update_pyramid
+from source import snapshots
+from source.models.arimax_forecast import arimax_forecast
+from source.models.xgboost_forecast import forecast_future_steps
+
+FORECASTERS = {
+    'arimax': arimax_forecast,
+    'xgboost': forecast_future_steps,
+}
+
+
+def process_pair(symbol, currency, data_path, model_choice='xgboost', steps=10, fetch=False, api_key=None, aggregate=10, days_back=30):
+    """
+    Optionally refresh the data for one pair, then forecast it. Fetching stores the base series
+    (see fetch_aggregate) and derives the requested aggregate and the pyramid levels from it.
+    Returns a JSON-serialisable dict; failures are reported in an 'error' field instead of raised.
+    """
+    result = {'symbol': symbol, 'currency': currency, 'model': model_choice}
+    try:
+        if fetch:
+            df = fetch_historical_data(api_key, symbol, currency, aggregate=fetch_aggregate(aggregate), days_back=days_back)
+            if df is None or df.empty:
+                result['error'] = f"No data available for {symbol} in {currency}."
+                return result
+            ensure_aggregate(symbol, currency, aggregate)
+            update_pyramid(symbol, currency)
+            snapshots.invalidate(symbol, currency)
+            snapshots.notify()
+
+        forecaster = FORECASTERS.get(model_choice)
+        if forecaster is None:
+            result['error'] = f"Invalid model choice {model_choice!r}."
+            return result
+
+        file_path = data_path(symbol, currency, aggregate)
+        if file_path is None:
+            result['error'] = f"No {aggregate}-minute data for {symbol}/{currency}."
+            return result
+        if model_choice == 'xgboost':
+            predictions, metrics = forecaster(file_path, steps=steps)
+        else:
+            predictions, metrics = forecaster(file_path)
+        tail = predictions[['time', 'predicted']].tail(steps).copy()
+        tail['time'] = tail['time'].dt.strftime('%Y-%m-%d %H:%M:%S')
+        result['predictions'] = tail.to_dict(orient='records')
+        result['metrics'] = {name: float(value) for name, value in metrics.items()}
+    except Exception as e:
+        print(f"Batch error for {symbol}/{currency}: {traceback.format_exc()}")
+        result['error'] = str(e)
+    return result
+
+
+def run_batch(pairs, data_path, max_workers=4, **kwargs):
+    """
+    Fan out process_pair over (symbol, currency) pairs on a bounded thread pool and yield
+    each result as soon as it completes, so one slow pair does not hold back the others.
+    """
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = [executor.submit(process_pair, symbol, currency, data_path, **kwargs) for symbol, currency in pairs]
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # If the client disconnects mid-stream, drop the pairs that have not started yet.
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,150 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+STORE_DIR = os.getenv('CANDLE_STORE_DIR', os.path.join('data', 'store'))
+COLUMNS = ('open', 'high', 'low', 'close', 'volumefrom', 'volumeto')
+ITEM_SIZE = 8
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def store_path(symbol, currency, aggregate=10, root=None):
+    """Directory holding the column files for one (symbol, currency, aggregate) series."""
+    return os.path.join(root or STORE_DIR, f'{symbol}_{currency}_{aggregate}m')
+
+
+def is_store(path):
+    """Return True if `path` points at a candle store series rather than a CSV file."""
+    return os.path.isdir(path) and os.path.exists(os.path.join(path, 'time.i8'))
+
+
+def _lock_for(path):
+    with _locks_guard:
+        lock = _locks.get(path)
+        if lock is None:
+            lock = _locks[path] = threading.Lock()
+        return lock
+
+
+def _column_file(path, column):
+    return os.path.join(path, 'time.i8' if column == 'time' else f'{column}.f8')
+
+
+def _row_count(path):
+    """
+    Number of complete rows. Columns are appended one after another, so an interrupted
+    write can leave some files longer than others; only rows present in every column count.
+    """
+    sizes = []
+    for column in ('time',) + COLUMNS:
+        try:
+            sizes.append(os.path.getsize(_column_file(path, column)))
+        except FileNotFoundError:
+            return 0
+    return min(sizes) // ITEM_SIZE
+
+
+def _to_epoch_seconds(times):
+    if pd.api.types.is_numeric_dtype(times):
+        return np.asarray(times, dtype=np.int64)
+    return pd.to_datetime(times).to_numpy(dtype='datetime64[s]').astype(np.int64)
+
+
+def _map(path, column, start, stop):
+    """Memory-map rows [start, stop) of one column without reading the rest of the file."""
+    dtype = np.int64 if column == 'time' else np.float64
+    if stop <= start:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(_column_file(path, column), dtype=dtype, mode='r', offset=start * ITEM_SIZE, shape=(stop - start,))
+
+
+def last_timestamp(path):
+    """Epoch seconds of the newest stored candle, or None if the series is empty."""
+    rows = _row_count(path)
+    if rows == 0:
+        return None
+    return int(_map(path, 'time', rows - 1, rows)[0])
+
+
+def append_candles(path, df):
+    """
+    Append candles to a series. Rows at or before the last stored timestamp are dropped,
+    so re-fetching an overlapping window only writes the new candles.
+    Returns the number of rows written.
+    """
+    if df is None or df.empty:
+        return 0
+
+    times = _to_epoch_seconds(df['time'])
+    order = np.argsort(times, kind='stable')
+    times = times[order]
+    keep = np.concatenate(([True], times[1:] != times[:-1]))
+
+    with _lock_for(os.path.abspath(path)):
+        os.makedirs(path, exist_ok=True)
+        rows = _row_count(path)
+        last = last_timestamp(path)
+        if last is not None:
+            keep &= times > last
+        if not keep.any():
+            return 0
+
+        # Trim any partially written tail from an interrupted append before writing.
+        for column in ('time',) + COLUMNS:
+            column_path = _column_file(path, column)
+            if os.path.exists(column_path) and os.path.getsize(column_path) != rows * ITEM_SIZE:
+                with open(column_path, 'r+b') as f:
+                    f.truncate(rows * ITEM_SIZE)
+
+        # The time column is written last, so a change to time.i8 (what file fingerprints look at)
+        # means every column of the new rows is on disk.
+        for column in COLUMNS:
+            values = df[column].to_numpy(dtype=np.float64)[order][keep] if column in df.columns else np.full(keep.sum(), np.nan)
+            with open(_column_file(path, column), 'ab') as f:
+                f.write(values.astype('<f8').tobytes())
+        with open(_column_file(path, 'time'), 'ab') as f:
+            f.write(times[keep].astype('<i8').tobytes())
+        return int(keep.sum())
+
+
+def read_arrays(path, start=None, end=None, last=None):
+    """
+    Read a range of candles as read-only memory-mapped arrays keyed by column name.
+
+    start/end are inclusive timestamps (anything pd.Timestamp accepts, or epoch seconds) and
+    are located by binary search over the time column. `last` limits the result to the newest
+    N rows of that range, so reading the tail costs O(N) regardless of the series length.
+    """
+    rows = _row_count(path)
+    lo, hi = 0, rows
+    if start is not None or end is not None:
+        times = _map(path, 'time', 0, rows)
+        if start is not None:
+            lo = int(np.searchsorted(times, _timestamp_seconds(start), side='left'))
+        if end is not None:
+            hi = int(np.searchsorted(times, _timestamp_seconds(end), side='right'))
+    if last is not None:
+        lo = max(lo, hi - int(last))
+    return {column: _map(path, column, lo, hi) for column in ('time',) + COLUMNS}
+
+
+def _timestamp_seconds(value):
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return int(pd.Timestamp(value).timestamp())
+
+
+def load_frame(path, start=None, end=None, last=None):
+    """Read candles into a DataFrame indexed by time, matching the models' load_data output."""
+    arrays = read_arrays(path, start=start, end=end, last=last)
+    index = pd.DatetimeIndex(pd.to_datetime(arrays.pop('time'), unit='s'), name='time')
+    return pd.DataFrame(arrays, index=index)
+
+
+def import_csv(file_path, symbol, currency, aggregate=10, root=None):
+    """Copy an existing data/crypto_data_*.csv file into the store."""
+    df = pd.read_csv(file_path)
+    return append_candles(store_path(symbol, currency, aggregate, root), df)
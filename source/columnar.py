@@ -0,0 +1,120 @@
+import gzip
+import json
+import struct
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON = 'application/json'
+COLUMNAR_JSON = 'application/vnd.columnar+json'
+ARROW_STREAM = 'application/vnd.apache.arrow.stream'
+RAW_COLUMNS = 'application/vnd.columnar.raw'
+
+
+def media_types():
+    """Response formats this process can produce, legacy JSON first so */* keeps getting it."""
+    return [JSON, COLUMNAR_JSON, RAW_COLUMNS] + ([ARROW_STREAM] if pa is not None else [])
+
+
+def encodings():
+    return (['zstd'] if zstandard is not None else []) + ['gzip']
+
+
+def negotiate(accept_mimetypes):
+    """Pick the response media type from a werkzeug Accept header; JSON unless a columnar type is preferred."""
+    return accept_mimetypes.best_match(media_types(), default=JSON)
+
+
+def negotiate_encoding(accept_encodings):
+    """Pick zstd or gzip from a werkzeug Accept-Encoding header, or None for an uncompressed body."""
+    for encoding in encodings():
+        if accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+def frame_columns(frame):
+    """
+    Turn a DataFrame into parallel arrays: datetime columns as int64 epoch milliseconds and
+    numeric columns as float64. Other columns are left out.
+    """
+    columns = {}
+    for name in frame.columns:
+        values = frame[name]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            columns[name] = values.to_numpy(dtype='datetime64[ms]').astype(np.int64)
+        elif pd.api.types.is_numeric_dtype(values):
+            columns[name] = values.to_numpy(dtype=np.float64)
+    return columns
+
+
+def encode(columns, media_type, meta=None):
+    """
+    Serialize parallel arrays in one of the columnar formats:
+
+    - COLUMNAR_JSON: {"rows": n, "columns": {name: [...]}, **meta}
+    - ARROW_STREAM: one Arrow IPC record batch, meta as JSON under the b'meta' schema key
+    - RAW_COLUMNS: uint32 LE header length, a JSON header describing each column
+      (name, dtype, offset, length) plus meta, then the little-endian buffers, 8-byte aligned
+    """
+    meta = meta or {}
+    rows = len(next(iter(columns.values()))) if columns else 0
+
+    if media_type == COLUMNAR_JSON:
+        body = {'rows': rows, 'columns': {name: _json_list(values) for name, values in columns.items()}, **meta}
+        return json.dumps(body, separators=(',', ':'), default=_json_default).encode()
+
+    if media_type == ARROW_STREAM:
+        table = pa.table({name: pa.array(values) for name, values in columns.items()})
+        table = table.replace_schema_metadata({'meta': json.dumps(meta, default=_json_default)})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes()
+
+    if media_type == RAW_COLUMNS:
+        header = {'rows': rows, 'columns': [], **meta}
+        buffers = []
+        offset = 0
+        for name, values in columns.items():
+            buffer = np.ascontiguousarray(values, dtype=values.dtype.newbyteorder('<')).tobytes()
+            header['columns'].append({'name': name, 'dtype': values.dtype.newbyteorder('<').str,
+                                      'offset': offset, 'length': len(values)})
+            buffers.append(buffer)
+            offset += len(buffer)
+        header_bytes = json.dumps(header, separators=(',', ':'), default=_json_default).encode()
+        # Pad the header so the first buffer starts on an 8-byte boundary (typed-array views need it)
+        header_bytes += b' ' * (-(4 + len(header_bytes)) % 8)
+        return struct.pack('<I', len(header_bytes)) + header_bytes + b''.join(buffers)
+
+    raise ValueError(f"Unsupported media type: {media_type}")
+
+
+def compress(body, encoding):
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor().compress(body)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+
+def _json_list(values):
+    # NaN is not valid JSON; send null instead
+    if values.dtype.kind == 'f' and np.isnan(values).any():
+        return [None if np.isnan(v) else v for v in values.tolist()]
+    return values.tolist()
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+
+METHODS = ('lttb', 'minmax')
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: positions of `n_out` points that keep the visual shape of
+    (x, y). The first and last points are always kept; every bucket in between contributes
+    the point forming the largest triangle with the previously chosen point and the next
+    bucket's mean. Bucket means come from cumulative sums, and each bucket is scored with
+    one vectorized expression.
+    """
+    n = len(y)
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])
+
+    x = np.asarray(x, dtype=np.float64)
+    x = x - x[0]
+    y = np.asarray(y, dtype=np.float64)
+
+    n_buckets = n_out - 2
+    bounds = (np.arange(n_buckets + 1) * ((n - 2) / n_buckets)).astype(np.int64) + 1
+    bounds[-1] = n - 1
+
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    sizes = np.maximum(bounds[1:] - bounds[:-1], 1)
+    mean_x = np.append((cum_x[bounds[1:]] - cum_x[bounds[:-1]]) / sizes, x[-1])
+    mean_y = np.append((cum_y[bounds[1:]] - cum_y[bounds[:-1]]) / sizes, y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_buckets):
+        lo, hi = bounds[i], max(bounds[i + 1], bounds[i] + 1)
+        cx, cy = mean_x[i + 1], mean_y[i + 1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        selected[i + 1] = a
+    return np.unique(selected)
+
+
+def minmax_indices(y, n_out):
+    """
+    Min/max buckets: split the points between the first and last into equal buckets and keep
+    each bucket's minimum and maximum, so spikes survive. Fully vectorized (one lexsort).
+    """
+    n = len(y)
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+
+    interior = np.asarray(y, dtype=np.float64)[1:n - 1]
+    n_buckets = max(1, (n_out - 2) // 2)
+    edges = np.linspace(0, len(interior), n_buckets + 1).astype(np.int64)
+    counts = np.diff(edges)
+    bucket = np.repeat(np.arange(n_buckets), counts)
+
+    order = np.lexsort((interior, bucket))
+    starts = edges[:-1][counts > 0]
+    ends = edges[1:][counts > 0] - 1
+    return np.unique(np.concatenate(([0], order[starts] + 1, order[ends] + 1, [n - 1])))
+
+
+def downsample(frame, max_points, method='lttb', x='time', columns=None):
+    """
+    Reduce a frame to at most `max_points` rows for charting, keeping the rows chosen by
+    `method` (lttb or minmax) on the value `columns` (default: every numeric column except x).
+    LTTB uses the first value column; min/max keeps the extremes of each one in buckets shared
+    by all columns, sized so the union stays within max_points (too small a budget for one
+    bucket per column falls back to LTTB). Frames already within the limit are returned unchanged.
+    """
+    if not max_points or len(frame) <= max_points:
+        return frame
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {METHODS}")
+
+    if columns is None:
+        columns = [c for c in frame.columns if c != x and pd.api.types.is_numeric_dtype(frame[c])]
+    if not columns:
+        return frame.iloc[np.linspace(0, len(frame) - 1, max_points).astype(np.int64)]
+
+    # Gaps are filled only for choosing rows; the returned values are untouched
+    values = frame[columns].ffill().bfill().to_numpy(dtype=np.float64)
+    # Every column keeps the first and last row plus a min and a max per bucket
+    n_buckets = (max_points - 2) // (2 * len(columns))
+    if method == 'minmax' and n_buckets >= 1:
+        per_column = 2 * n_buckets + 2
+        rows = np.unique(np.concatenate([minmax_indices(values[:, i], per_column) for i in range(len(columns))]))
+        return frame.iloc[rows]
+
+    if x in frame.columns and pd.api.types.is_datetime64_any_dtype(frame[x]):
+        xs = frame[x].to_numpy(dtype='datetime64[ms]').astype(np.int64)
+    elif x in frame.columns and pd.api.types.is_numeric_dtype(frame[x]):
+        xs = frame[x].to_numpy(dtype=np.float64)
+    else:
+        xs = np.arange(len(frame))
+    return frame.iloc[lttb_indices(xs, values[:, 0], max_points)]
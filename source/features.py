@@ -0,0 +1,146 @@
+import threading
+import numpy as np
+import pandas as pd
+from source.ring_buffer import RingBuffer
+
+_lock = threading.Lock()
+_streams = {}
+
+
+class FeatureEngine:
+    """
+    Declarative feature definitions computed either in batch over a whole series or
+    incrementally, one tick at a time, with the same output.
+
+    Specs are (kind, n) tuples:
+        ('lag', n)            value n steps back
+        ('rolling_mean', w)   mean of the last w values, including the current one
+        ('rolling_std', w)    sample std (ddof=1) of the last w values
+        ('ewma', span)        exponentially weighted mean, alpha = 2 / (span + 1), adjust=False
+        ('return', n)         value / value n steps back - 1
+    Rows without enough history are NaN in both modes.
+    """
+
+    NAMES = {
+        'lag': '{column}_lag{n}',
+        'rolling_mean': 'rolling_mean_{n}',
+        'rolling_std': 'rolling_std_{n}',
+        'ewma': 'ewma_{n}',
+        'return': 'return_{n}',
+    }
+
+    def __init__(self, specs, column='close', names=None):
+        for kind, n in specs:
+            if kind not in self.NAMES:
+                raise ValueError(f"Unknown feature kind {kind!r}")
+            if n < 1:
+                raise ValueError(f"Feature {kind} needs a positive window, got {n}")
+        self.specs = list(specs)
+        self.column = column
+        templates = {**self.NAMES, **(names or {})}
+        self.feature_names = [templates[kind].format(column=column, n=n) for kind, n in self.specs]
+        self.history = max([n + 1 if kind in ('lag', 'return') else n for kind, n in self.specs if kind != 'ewma'] or [1])
+
+    def transform_values(self, values):
+        """Vectorized batch mode: a (len(values), n_features) array, one row per input value."""
+        values = np.asarray(values, dtype=np.float64)
+        out = np.full((len(values), len(self.specs)), np.nan)
+        for j, (kind, n) in enumerate(self.specs):
+            if kind == 'lag':
+                if n < len(values):
+                    out[n:, j] = values[:-n]
+            elif kind == 'return':
+                if n < len(values):
+                    out[n:, j] = values[n:] / values[:-n] - 1
+            elif kind in ('rolling_mean', 'rolling_std'):
+                if n <= len(values):
+                    windows = np.lib.stride_tricks.sliding_window_view(values, n)
+                    out[n - 1:, j] = windows.mean(axis=1) if kind == 'rolling_mean' else windows.std(axis=1, ddof=1)
+            elif kind == 'ewma':
+                out[:, j] = pd.Series(values).ewm(span=n, adjust=False).mean().to_numpy()
+        return out
+
+    def transform(self, df):
+        """Batch mode over a DataFrame: returns a new DataFrame of features with df's index."""
+        return pd.DataFrame(self.transform_values(df[self.column].to_numpy()), index=df.index, columns=self.feature_names)
+
+    def add_to(self, df):
+        """Return a copy of df with the feature columns appended, without mutating df."""
+        return pd.concat([df, self.transform(df)], axis=1)
+
+    def stream(self):
+        """A fresh incremental state for one series."""
+        return FeatureStream(self)
+
+
+class FeatureStream:
+    """
+    Incremental state of a FeatureEngine for one series. update() costs O(window) per tick
+    independent of how much history has been seen, and returns the same row transform_values
+    would produce for that position.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.lock = threading.RLock()
+        self.count = 0
+        self._ring = RingBuffer(engine.history)
+        self._ewma = {}
+
+    def update(self, value):
+        with self.lock:
+            self._ring.append(value)
+            self.count += 1
+            row = np.full(len(self.engine.specs), np.nan)
+            available = len(self._ring)
+            for j, (kind, n) in enumerate(self.engine.specs):
+                if kind == 'lag':
+                    if self.count > n:
+                        row[j] = self._ring.latest(n + 1)[n]
+                elif kind == 'return':
+                    if self.count > n:
+                        row[j] = value / self._ring.latest(n + 1)[n] - 1
+                elif kind in ('rolling_mean', 'rolling_std'):
+                    if available >= n:
+                        window = self._ring.latest(n, newest_first=False)
+                        row[j] = window.mean() if kind == 'rolling_mean' else window.std(ddof=1)
+                elif kind == 'ewma':
+                    alpha = 2.0 / (n + 1)
+                    previous = self._ewma.get(n)
+                    self._ewma[n] = value if previous is None else alpha * value + (1 - alpha) * previous
+                    row[j] = self._ewma[n]
+            return row
+
+    def next_lags(self, lags):
+        """
+        Lag vector (lag_1 .. lag_n) for the step after the newest value, i.e. the lag features
+        of the row that has not been observed yet. Returns None until enough values are buffered.
+        """
+        with self.lock:
+            if len(self._ring) < lags:
+                return None
+            return self._ring.latest(lags)
+
+
+def get_feature_stream(key, engine):
+    """
+    Return the shared FeatureStream for `key` (e.g. (symbol, currency, model_path)),
+    replacing it if it was created for a different engine.
+
+    Streams are shared by every client of a key and live for the whole process, so their lag
+    state survives reconnects. Memory is bounded by the number of distinct keys, each holding
+    only the engine's window of recent values.
+    """
+    with _lock:
+        stream = _streams.get(key)
+        if stream is None or stream.engine.feature_names != engine.feature_names:
+            stream = _streams[key] = engine.stream()
+        return stream
+
+
+def lag_engine(lags, column='USD'):
+    """Lag-only engine producing the {column}_lag_1..{column}_lag_n features of the XGBoost and linear models."""
+    return FeatureEngine([('lag', i) for i in range(1, lags + 1)], column=column, names={'lag': '{column}_lag_{n}'})
+
+
+BASE_FEATURES = FeatureEngine([('lag', 1), ('lag', 2), ('rolling_mean', 5), ('rolling_std', 5)])
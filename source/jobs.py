@@ -0,0 +1,124 @@
+import hashlib
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_WORKERS = int(os.getenv('TRAINING_WORKERS', 2))
+MAX_FINISHED_JOBS = 256
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='training')
+_lock = threading.Lock()
+_jobs = OrderedDict()
+_in_flight = {}
+_counters = {'submitted': 0, 'deduplicated': 0, 'completed': 0, 'failed': 0}
+
+
+def file_fingerprint(path):
+    """
+    Cheap fingerprint of the data behind a CSV file or candle store series (size and mtime),
+    used to recognise identical training requests without reading the data.
+    """
+    target = os.path.join(path, 'time.i8') if os.path.isdir(path) else path
+    try:
+        stat = os.stat(target)
+    except FileNotFoundError:
+        return None
+    return hashlib.sha1(f'{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}'.encode()).hexdigest()
+
+
+def submit_job(fn, key, **info):
+    """
+    Queue fn() on the training pool and return the job record.
+    If a job with the same key is still queued or running, that job is returned instead.
+    """
+    with _lock:
+        job_id = _in_flight.get(key)
+        if job_id is not None:
+            _counters['deduplicated'] += 1
+            return _public(_jobs[job_id])
+
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': 'queued',
+            'submitted_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'result': None,
+            'error': None,
+            'key': key,
+            'done': threading.Event(),
+            **info,
+        }
+        _jobs[job['id']] = job
+        _in_flight[key] = job['id']
+        _counters['submitted'] += 1
+        _prune()
+
+    _executor.submit(_run, job, fn)
+    return _public(job)
+
+
+def _run(job, fn):
+    with _lock:
+        job['status'] = 'running'
+        job['started_at'] = time.time()
+    try:
+        result = fn()
+        status, error = 'done', None
+    except Exception as e:
+        print(f"Training job {job['id']} failed: {traceback.format_exc()}")
+        result, status, error = None, 'failed', str(e)
+
+    with _lock:
+        job['result'] = result
+        job['error'] = error
+        job['status'] = status
+        job['finished_at'] = time.time()
+        _counters['completed' if status == 'done' else 'failed'] += 1
+        if _in_flight.get(job['key']) == job['id']:
+            del _in_flight[job['key']]
+    job['done'].set()
+
+
+def _prune():
+    """Forget the oldest finished jobs once more than MAX_FINISHED_JOBS are kept."""
+    finished = [job_id for job_id, job in _jobs.items() if job['status'] in ('done', 'failed')]
+    for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+        del _jobs[job_id]
+
+
+def _public(job):
+    return {k: v for k, v in job.items() if k not in ('key', 'done')}
+
+
+def get_job(job_id):
+    """Return a snapshot of the job, or None if it is unknown."""
+    with _lock:
+        job = _jobs.get(job_id)
+        return _public(job) if job else None
+
+
+def wait_for_job(job_id, timeout=None):
+    """Block until the job finishes or the timeout elapses, then return its snapshot."""
+    with _lock:
+        job = _jobs.get(job_id)
+    if job is None:
+        return None
+    job['done'].wait(timeout)
+    return get_job(job_id)
+
+
+def queue_metrics():
+    """Queue depth, running jobs and lifetime counters."""
+    with _lock:
+        statuses = [job['status'] for job in _jobs.values()]
+        return {
+            'queued': statuses.count('queued'),
+            'running': statuses.count('running'),
+            'workers': MAX_WORKERS,
+            **_counters,
+        }
@@ -0,0 +1,114 @@
+import asyncio
+import time
+from dataclasses import dataclass
+import aiohttp
+from source.api import API_BASE_URL
+from source.metrics import inc
+
+
+@dataclass(frozen=True)
+class Tick:
+    """A single price observation for one pair."""
+    symbol: str
+    currency: str
+    price: float
+    time: float
+
+    def to_dict(self):
+        return {
+            'symbol': self.symbol,
+            'currency': self.currency,
+            'time': time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(self.time)),
+            self.currency: self.price,
+        }
+
+
+class LiveClient:
+    """
+    Asyncio client that polls CryptoCompare's pricemulti endpoint for many pairs in one
+    round trip over a persistent connection pool.
+
+    Usage:
+        async with LiveClient(api_key, [('ETH', 'USD'), ('BTC', 'EUR')]) as client:
+            async for ticks in client.stream():
+                ...
+    """
+
+    def __init__(self, api_key, pairs, interval=5, base_url=None, session=None, max_connections=10, timeout=10):
+        self.api_key = api_key
+        self.pairs = list(dict.fromkeys(pairs))
+        self.interval = interval
+        self.url = f"{(base_url or API_BASE_URL).rstrip('/')}/data/pricemulti"
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._session = session
+        self._owns_session = session is None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _get_session(self):
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    async def close(self):
+        if self._session is not None and self._owns_session:
+            await self._session.close()
+        self._session = None
+
+    async def fetch_prices(self):
+        """Fetch the current price of every tracked pair with a single pricemulti request."""
+        if not self.pairs:
+            return []
+        params = {
+            'fsyms': ','.join(dict.fromkeys(symbol for symbol, _ in self.pairs)),
+            'tsyms': ','.join(dict.fromkeys(currency for _, currency in self.pairs)),
+        }
+        if self.api_key:
+            params['api_key'] = self.api_key
+
+        async with self._get_session().get(self.url, params=params) as response:
+            inc('upstream_api_calls_total', endpoint='pricemulti', status=response.status)
+            response.raise_for_status()
+            data = await response.json(content_type=None)
+
+        if data.get('Response') == 'Error':
+            raise ValueError(data.get('Message', 'pricemulti request failed'))
+
+        now = time.time()
+        ticks = []
+        for symbol, currency in self.pairs:
+            price = data.get(symbol, {}).get(currency)
+            if price is not None:
+                ticks.append(Tick(symbol, currency, float(price), now))
+        return ticks
+
+    async def stream(self, stop=None):
+        """
+        Yield the list of ticks from each poll. Polls are scheduled on a fixed grid
+        (start + k * interval) so request latency does not accumulate as drift; if a poll
+        overruns, the missed slots are skipped rather than fired back to back.
+        `self.pairs` may be replaced between polls. The stream ends once `stop` (a
+        threading.Event) is set.
+        """
+        loop = asyncio.get_running_loop()
+        next_at = loop.time()
+        while stop is None or not stop.is_set():
+            try:
+                ticks = await self.fetch_prices()
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                print(f"Error fetching live prices: {e}")
+                ticks = None
+            if ticks:
+                yield ticks
+
+            next_at += self.interval
+            now = loop.time()
+            if now > next_at:
+                next_at += ((now - next_at) // self.interval + 1) * self.interval
+            await asyncio.sleep(next_at - now)
@@ -0,0 +1,113 @@
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float('inf'))
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_help = {}
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def describe(name, text):
+    """Set the # HELP line for a metric."""
+    _help[name] = text
+
+
+def inc(name, amount=1, **labels):
+    """Increment a counter."""
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[_key(labels)] = series.get(_key(labels), 0) + amount
+
+
+def observe(name, value, **labels):
+    """Record one observation in a histogram."""
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        hist = series.get(_key(labels))
+        if hist is None:
+            hist = series[_key(labels)] = {'buckets': [0] * len(DEFAULT_BUCKETS), 'sum': 0.0, 'count': 0}
+        for i, bound in enumerate(DEFAULT_BUCKETS):
+            if value <= bound:
+                hist['buckets'][i] += 1
+                break
+        hist['sum'] += value
+        hist['count'] += 1
+
+
+@contextmanager
+def timed(stage, **labels):
+    """
+    Time a block as a span of the stage_duration_seconds histogram:
+
+        with timed('fit', model='arimax'):
+            ...
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe('stage_duration_seconds', time.perf_counter() - started, stage=stage, **labels)
+
+
+def _format_labels(key, extra=None):
+    pairs = list(key) + (extra or [])
+    if not pairs:
+        return ''
+    body = ','.join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return '{' + body + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+
+def render():
+    """Render every metric in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        for name in sorted(_counters):
+            if name in _help:
+                lines.append(f'# HELP {name} {_help[name]}')
+            lines.append(f'# TYPE {name} counter')
+            for key, value in sorted(_counters[name].items()):
+                lines.append(f'{name}{_format_labels(key)} {value}')
+
+        for name in sorted(_histograms):
+            if name in _help:
+                lines.append(f'# HELP {name} {_help[name]}')
+            lines.append(f'# TYPE {name} histogram')
+            for key, hist in sorted(_histograms[name].items()):
+                cumulative = 0
+                for bound, count in zip(DEFAULT_BUCKETS, hist['buckets']):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(key, [("le", _format_bound(bound))])} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(key)} {hist["sum"]}')
+                lines.append(f'{name}_count{_format_labels(key)} {hist["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """Drop every recorded value."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+describe('stage_duration_seconds', 'Time spent in each pipeline stage.')
+describe('http_request_duration_seconds', 'Flask request latency by endpoint.')
+describe('model_cache_requests_total', 'Model cache lookups by result.')
+describe('upstream_api_calls_total', 'Requests sent to CryptoCompare by endpoint and status.')
+describe('snapshot_requests_total', 'Precomputed response lookups by result.')
+describe('snapshot_refreshes_total', 'Scheduled snapshot rebuilds by status.')
+describe('candles_appended_total', 'Candles appended to the store by the background refresher.')
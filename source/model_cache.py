@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import tempfile
+import joblib
+import pandas as pd
+from source.metrics import inc
+
+CACHE_DIR = os.getenv('MODEL_CACHE_DIR', os.path.join('models', 'cache'))
+MAX_ENTRIES = int(os.getenv('MODEL_CACHE_MAX_ENTRIES', 64))
+MAX_BYTES = int(os.getenv('MODEL_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+
+def data_fingerprint(frames, params=None):
+    """
+    Build a cache key from the content of one or more DataFrames/Series and a dict of hyperparameters.
+    """
+    digest = hashlib.sha256()
+    for frame in frames:
+        digest.update(pd.util.hash_pandas_object(frame, index=True).values.tobytes())
+        if isinstance(frame, pd.DataFrame):
+            digest.update(','.join(map(str, frame.columns)).encode())
+    digest.update(json.dumps(params or {}, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def _entry_path(key, cache_dir):
+    return os.path.join(cache_dir, f'{key}.joblib')
+
+
+def cache_get(key, cache_dir=None):
+    """
+    Return the cached package for `key`, or None on a miss.
+    A hit refreshes the entry's mtime so it becomes the most recently used.
+    """
+    path = _entry_path(key, cache_dir or CACHE_DIR)
+    try:
+        package = joblib.load(path)
+    except FileNotFoundError:
+        inc('model_cache_requests_total', result='miss')
+        return None
+    except Exception as e:
+        print(f"Discarding unreadable cache entry {path}: {e}")
+        _remove(path)
+        inc('model_cache_requests_total', result='miss')
+        return None
+    inc('model_cache_requests_total', result='hit')
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+    return package
+
+
+def cache_put(key, package, cache_dir=None, max_entries=None, max_bytes=None):
+    """
+    Store a model package (fitted model, chosen params and metrics) and evict least recently used entries.
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+    os.close(fd)
+    try:
+        joblib.dump(package, tmp_path)
+        os.replace(tmp_path, _entry_path(key, cache_dir))
+    except Exception:
+        _remove(tmp_path)
+        raise
+    evict(cache_dir, max_entries, max_bytes)
+
+
+def evict(cache_dir=None, max_entries=None, max_bytes=None):
+    """
+    Remove least recently used entries until the cache fits within the entry and size limits.
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    max_entries = MAX_ENTRIES if max_entries is None else max_entries
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+
+    entries = []
+    for filename in os.listdir(cache_dir):
+        if not filename.endswith('.joblib'):
+            continue
+        path = os.path.join(cache_dir, filename)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    entries.sort()
+    total_bytes = sum(size for _, size, _ in entries)
+    while entries and (len(entries) > max_entries or total_bytes > max_bytes):
+        _, size, path = entries.pop(0)
+        _remove(path)
+        total_bytes -= size
+
+
+def clear(cache_dir=None):
+    """Remove every cached model package."""
+    cache_dir = cache_dir or CACHE_DIR
+    if not os.path.isdir(cache_dir):
+        return
+    for filename in os.listdir(cache_dir):
+        if filename.endswith('.joblib'):
+            _remove(os.path.join(cache_dir, filename))
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,73 @@
+import os
+import threading
+import joblib
+import numpy as np
+
+_lock = threading.Lock()
+_entries = {}
+
+
+class _Entry:
+    """A loaded model package plus per-thread feature buffers sized for it."""
+
+    def __init__(self, package, mtime_ns):
+        self.package = package
+        self.mtime_ns = mtime_ns
+        self.n_features = len(package['features'])
+        self.local = threading.local()
+        model = package['model']
+        # XGBoost boosters predict straight from a NumPy array without the sklearn wrapper checks.
+        self.booster = model.get_booster() if hasattr(model, 'get_booster') else None
+
+    def buffer(self):
+        buf = getattr(self.local, 'buf', None)
+        if buf is None:
+            buf = self.local.buf = np.empty((1, self.n_features), dtype=np.float64)
+        return buf
+
+
+def _get_entry(model_path):
+    mtime_ns = os.stat(model_path).st_mtime_ns
+    entry = _entries.get(model_path)
+    if entry is not None and entry.mtime_ns == mtime_ns:
+        return entry
+
+    with _lock:
+        entry = _entries.get(model_path)
+        if entry is None or entry.mtime_ns != mtime_ns:
+            print(f"Loading model package from: {model_path}")
+            entry = _Entry(joblib.load(model_path), mtime_ns)
+            _entries[model_path] = entry
+        return entry
+
+
+def get_model_package(model_path):
+    """
+    Return the model package stored at model_path, loading it only the first time and
+    again whenever the file's mtime changes.
+    """
+    return _get_entry(model_path).package
+
+
+def predict_lags(model_path, lag_values):
+    """
+    Predict from lag values ordered newest first (USD_lag_1, USD_lag_2, ...).
+    The values are written into a preallocated per-thread buffer instead of building a DataFrame.
+    """
+    entry = _get_entry(model_path)
+    if len(lag_values) < entry.n_features:
+        raise ValueError(f"Not enough previous values for prediction. Expected {entry.n_features}, got {len(lag_values)}.")
+
+    buf = entry.buffer()
+    buf[0, :] = lag_values[:entry.n_features]
+    if entry.booster is not None:
+        prediction = entry.booster.inplace_predict(buf, validate_features=False)
+    else:
+        prediction = entry.package['model'].predict(buf)
+    return float(prediction[0])
+
+
+def clear():
+    """Forget every loaded model package."""
+    with _lock:
+        _entries.clear()
@@ -3,12 +3,20 @@ import numpy as np
 from statsmodels.tsa.arima.model import ARIMA
 from sklearn.metrics import mean_squared_error, mean_absolute_error, median_absolute_error
 from itertools import product
+from concurrent.futures import ProcessPoolExecutor
+import os
+import threading
+from source.candle_store import is_store, load_frame
+from source.metrics import timed
+from source.model_cache import data_fingerprint, cache_get, cache_put
 import matplotlib.pyplot as plt
 import warnings
 warnings.filterwarnings("ignore")  
 
 def load_data(file_path):
-    """Load time series data from a CSV file."""
+    """Load time series data from a CSV file or a candle store series."""
+    if is_store(file_path):
+        return load_frame(file_path)
     data = pd.read_csv(file_path, parse_dates=['time'], index_col='time')
     return data
 
@@ -39,34 +47,149 @@ def split_data(target, exog, train_ratio=0.8):
     
     return train_target, test_target, train_exog, test_exog
 
-def grid_search_arimax(train_target, train_exog, p_range=(0, 2), d_range=(0, 2), q_range=(0, 2)):
-    """Perform grid search to find the best ARIMAX(p, d, q) parameters."""
-    best_rmse = float("inf")
-    best_order = None
-    
-    for p, d, q in product(range(*p_range), range(*d_range), range(*q_range)):
+CRITERIA = ('rmse', 'aic', 'bic')
+
+def exog_scaler(train_exog):
+    """
+    Column means and standard deviations (1 where a column is constant) of the training exog.
+    Raw volumes are orders of magnitude larger than prices, which leaves L-BFGS stopping early
+    on a badly scaled problem, so every fit uses standardised exog. The scaling is undone by the
+    regression coefficients, so fitted residuals and forecasts are unaffected.
+    """
+    values = np.asarray(train_exog, dtype=np.float64)
+    scale = values.std(axis=0)
+    scale[scale == 0] = 1.0
+    return values.mean(axis=0), scale
+
+def scale_exog(exog, scaler):
+    """Standardise exog (a DataFrame keeps its index) with the training scaler; None leaves it unchanged."""
+    if scaler is None:
+        return exog
+    mean, scale = scaler
+    return (exog - mean) / scale
+
+def _search_arrays(train_target, train_exog):
+    """
+    Contiguous float64 copies of the training data with standardised exog, built once per
+    search and shared by every candidate.
+    """
+    endog = np.ascontiguousarray(np.asarray(train_target, dtype=np.float64))
+    exog = np.ascontiguousarray(scale_exog(np.asarray(train_exog, dtype=np.float64), exog_scaler(train_exog)))
+    return endog, exog
+
+def _score_order(endog, exog, order, criterion='rmse', start_params=None):
+    """
+    Fit a single ARIMAX candidate and return (score, {param name: value}), or None if the fit
+    fails. The rmse score is the in-sample one-step RMSE, taken from the filter residuals.
+    `start_params` maps parameter names to starting values; parameters it lacks start at 0.
+    """
+    try:
+        model = ARIMA(endog, exog=exog, order=order, concentrate_scale=True)
+        start = None
+        if start_params is not None:
+            start = np.array([start_params.get(name, 0.0) for name in model.param_names])
         try:
-            model = ARIMA(train_target, exog=train_exog, order=(p, d, q))
-            model_fit = model.fit()
-            
-            train_pred = model_fit.predict(start=train_target.index[0], end=train_target.index[-1], exog=train_exog)
-            rmse = np.sqrt(mean_squared_error(train_target, train_pred))
-            
-            if rmse < best_rmse:
-                best_rmse = rmse
-                best_order = (p, d, q)
-        except Exception as e:
-            continue 
-    return best_order
-
-def fit_arimax_model(train_target, train_exog, order):
-    """Fit the ARIMAX model using the best order from grid search."""
-    model = ARIMA(train_target, exog=train_exog, order=order)
-    model_fit = model.fit()
+            model_fit = model.fit(start_params=start, cov_type='none')
+        except Exception:
+            if start is None:
+                raise
+            model_fit = model.fit(cov_type='none')
+
+        if criterion == 'aic':
+            score = model_fit.aic
+        elif criterion == 'bic':
+            score = model_fit.bic
+        else:
+            score = np.sqrt(np.mean(np.square(model_fit.resid)))
+        if not np.isfinite(score):
+            return None
+        return score, dict(zip(model.param_names, model_fit.params))
+    except Exception:
+        return None
+
+# Order search workers (0: every core) and the pruning ratio used by arimax_forecast (unset: no pruning)
+ARIMAX_JOBS = int(os.getenv('ARIMAX_JOBS', 0)) or None
+ARIMAX_PRUNE_RATIO = float(os.getenv('ARIMAX_PRUNE_RATIO', 0)) or None
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+def _get_executor(n_jobs):
+    """Return a process pool with `n_jobs` workers, reused across requests and threads."""
+    with _executors_lock:
+        executor = _executors.get(n_jobs)
+        if executor is None:
+            executor = ProcessPoolExecutor(max_workers=n_jobs)
+            _executors[n_jobs] = executor
+    return executor
+
+def grid_search_arimax(train_target, train_exog, p_range=(0, 2), d_range=(0, 2), q_range=(0, 2), n_jobs=1, prune_ratio=None,
+                       criterion='rmse', warm_start=True):
+    """
+    Perform grid search to find the best ARIMAX(p, d, q) parameters.
+
+    Candidates are ranked by `criterion` (in-sample 'rmse', 'aic' or 'bic'). The target and
+    exogenous arrays are converted once and shared by every fit. Candidates run in waves of
+    equal p + q; with warm_start each one starts from the fitted parameters of its neighbour
+    (p, d, q-1), else (p-1, d, q), from the previous wave, with the extra lag coefficients
+    starting at 0. With n_jobs > 1 each wave is fitted in a process pool (n_jobs=None uses
+    every core). Seeds and tie-breaking (grid order) do not depend on n_jobs, so the serial
+    and pooled searches return the same order. If prune_ratio is set, candidates whose
+    lower-order neighbour (p-1 or q-1, same d) scored worse than prune_ratio * best score so
+    far are skipped (meant for rmse, which is always positive).
+    """
+    if criterion not in CRITERIA:
+        raise ValueError(f"criterion must be one of {CRITERIA}")
+    orders = list(product(range(*p_range), range(*d_range), range(*q_range)))
+    endog, exog = _search_arrays(train_target, train_exog)
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+    n_jobs = min(n_jobs, len(orders))
+    executor = _get_executor(n_jobs) if n_jobs > 1 else None
+
+    scores = {}
+    fitted = {}
+    pruned = set()
+    for wave in sorted({p + q for p, _, q in orders}):
+        batch = [order for order in orders if order[0] + order[2] == wave and order not in pruned]
+        seeds = {}
+        for p, d, q in batch:
+            if warm_start:
+                seeds[(p, d, q)] = next((fitted[o] for o in ((p, d, q - 1), (p - 1, d, q)) if o in fitted), None)
+
+        if executor is None:
+            results = [_score_order(endog, exog, order, criterion, seeds.get(order)) for order in batch]
+        else:
+            futures = [executor.submit(_score_order, endog, exog, order, criterion, seeds.get(order)) for order in batch]
+            results = [future.result() for future in futures]
+
+        for order, scored in zip(batch, results):
+            if scored is not None:
+                scores[order], fitted[order] = scored
+
+        if prune_ratio is not None and scores:
+            best_score = min(scores.values())
+            for p, d, q in batch:
+                if (p, d, q) in scores and scores[(p, d, q)] > prune_ratio * best_score:
+                    pruned.update(((p + 1, d, q), (p, d, q + 1)))
+
+    if not scores:
+        return None
+    return min(scores, key=lambda order: (scores[order], orders.index(order)))
+
+def fit_arimax_model(train_target, train_exog, order, scaler=None):
+    """
+    Fit the ARIMAX model using the best order from grid search, specified as in the search
+    (concentrated scale, exog standardised with `scaler`, see exog_scaler). This is the model
+    that is served and extended, so it gets more L-BFGS iterations than a search candidate.
+    """
+    model = ARIMA(train_target, exog=scale_exog(train_exog, scaler), order=order, concentrate_scale=True)
+    model_fit = model.fit(method_kwargs={'maxiter': 200})
     return model_fit
 
-def make_predictions(model_fit, test_exog):
-    """Make predictions using the fitted ARIMAX model."""
+def make_predictions(model_fit, test_exog, scaler=None):
+    """Make predictions using the fitted ARIMAX model; `scaler` must be the one it was fitted with."""
+    test_exog = scale_exog(test_exog, scaler)
     predictions = model_fit.forecast(steps=len(test_exog), exog=test_exog[-len(test_exog):])
     return predictions
 
@@ -86,18 +209,102 @@ def plot_results(test_target, predictions):
     plt.legend()
     plt.show()
 
-def arimax_forecast(file_path):
-    data = load_data(file_path)
-    target, exog = preprocess_data(data)
+def update_arimax_model(state, train_target, train_exog):
+    """
+    Extend a previously fitted ARIMAX model with candles appended since it was fitted.
+
+    The fitted parameters are kept and only the state-space filter is run over the new rows.
+    Returns None when the training data no longer extends the cached fit (e.g. rows were
+    replaced or the window moved), in which case a full refit is required.
+    """
+    if state.get('scaler') is None:
+        return None
+    fitted_end = state['train_end']
+    if len(train_target) == 0 or train_target.index[0] != state['train_start'] or fitted_end not in train_target.index:
+        return None
+
+    pos = train_target.index.get_loc(fitted_end)
+    if pos + 1 != state['nobs'] or train_target.iloc[pos] != state['last_value']:
+        return None
+
+    new_target = train_target.iloc[pos + 1:]
+    if new_target.empty:
+        return state['model']
+    return state['model'].append(new_target, exog=scale_exog(train_exog.iloc[pos + 1:], state['scaler']))
+
+def arimax_forecast(file_path, n_jobs=ARIMAX_JOBS, use_cache=True, incremental=True, search_every=24, drift_threshold=1.5,
+                    prune_ratio=ARIMAX_PRUNE_RATIO):
+    """
+    Backtest an ARIMAX model on the last 20% of the file.
+
+    The order search uses `n_jobs` processes and `prune_ratio` (see grid_search_arimax),
+    by default the ARIMAX_JOBS and ARIMAX_PRUNE_RATIO environment variables.
+
+    With incremental=True the previous fit for this file is extended with newly appended
+    candles instead of refitting. The order search only re-runs every `search_every`
+    updates or when the test RMSE exceeds `drift_threshold` times the RMSE at the last search.
+    """
+    with timed('load', model='arimax'):
+        data = load_data(file_path)
+        target, exog = preprocess_data(data)
     
     train_target, test_target, train_exog, test_exog = split_data(target, exog)
-    
-    best_order = grid_search_arimax(train_target, train_exog, p_range=(0, 3), d_range=(0, 2), q_range=(0, 3))
-    print(f"Best ARIMA order: {best_order}")
-    
-    arimax_model = fit_arimax_model(train_target, train_exog, order=best_order)
-    
-    predictions = make_predictions(arimax_model, test_exog)
+
+    search_space = {'p_range': (0, 3), 'd_range': (0, 2), 'q_range': (0, 3)}
+    cache_key = data_fingerprint([train_target, train_exog, test_target, test_exog], {'model': 'arimax', 'exog': 'standardised', **search_space})
+    if use_cache:
+        cached = cache_get(cache_key)
+        if cached is not None:
+            print(f"Using cached ARIMAX model with order {cached['order']}")
+            return cached['result'].copy(), dict(cached['metrics'])
+
+    state_key = data_fingerprint([], {'model': 'arimax_state', 'exog': 'standardised', 'file_path': os.path.abspath(file_path), **search_space})
+    state = cache_get(state_key) if incremental else None
+
+    arimax_model = None
+    if state is not None and state['updates'] < search_every:
+        with timed('update', model='arimax'):
+            arimax_model = update_arimax_model(state, train_target, train_exog)
+
+    if arimax_model is not None:
+        best_order = state['order']
+        scaler = state['scaler']
+        updates = state['updates'] + 1
+        baseline_rmse = state['baseline_rmse']
+        with timed('predict', model='arimax'):
+            predictions = make_predictions(arimax_model, test_exog, scaler)
+        if evaluate_model(test_target, predictions) > drift_threshold * baseline_rmse:
+            print(f"Forecast error drifted past {drift_threshold}x baseline, re-running order search.")
+            arimax_model = None
+        else:
+            print(f"Updated ARIMA order {best_order} incrementally ({updates} updates since last search)")
+
+    if arimax_model is None:
+        with timed('search', model='arimax'):
+            best_order = grid_search_arimax(train_target, train_exog, n_jobs=n_jobs, prune_ratio=prune_ratio, **search_space)
+        print(f"Best ARIMA order: {best_order}")
+
+        scaler = exog_scaler(train_exog)
+        with timed('fit', model='arimax'):
+            arimax_model = fit_arimax_model(train_target, train_exog, order=best_order, scaler=scaler)
+
+        with timed('predict', model='arimax'):
+            predictions = make_predictions(arimax_model, test_exog, scaler)
+        updates = 0
+        baseline_rmse = evaluate_model(test_target, predictions)
+
+    if incremental:
+        cache_put(state_key, {
+            'model': arimax_model,
+            'order': best_order,
+            'scaler': scaler,
+            'train_start': train_target.index[0],
+            'train_end': train_target.index[-1],
+            'nobs': len(train_target),
+            'last_value': train_target.iloc[-1],
+            'updates': updates,
+            'baseline_rmse': baseline_rmse,
+        })
     
     error = evaluate_model(test_target, predictions)
     mse = mean_squared_error(test_target, predictions)
@@ -126,5 +333,13 @@ def arimax_forecast(file_path):
     })
    
     result.to_csv('arima_predictions.csv', index=False)
+
+    if use_cache:
+        cache_put(cache_key, {
+            'model': arimax_model,
+            'order': best_order,
+            'metrics': metrics,
+            'result': result,
+        })
     
     return result, metrics
\ No newline at end of file
@@ -1,14 +1,14 @@
 from sklearn.linear_model import LinearRegression
 from sklearn.model_selection import train_test_split
 import joblib
+from source.features import lag_engine
 
 
 def create_lagged_features(data, target_column, lags):
     """
     Create lagged features for a time series dataset.
     """
-    for lag in range(1, lags + 1):
-        data[f'{target_column}_lag_{lag}'] = data[target_column].shift(lag)
+    data = lag_engine(lags, target_column).add_to(data)
 
     data = data.dropna().reset_index(drop=True)
 
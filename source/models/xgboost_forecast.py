@@ -1,15 +1,23 @@
 import xgboost as xgb
 from sklearn.metrics import mean_squared_error, mean_absolute_error, median_absolute_error
-from sklearn.model_selection import GridSearchCV
+from sklearn.model_selection import ParameterGrid
 import numpy as np
 import pandas as pd
 import joblib 
 import os
 import json
+import re
+from source.candle_store import STORE_DIR, is_store, load_frame, read_arrays
+from source.model_registry import get_model_package, predict_lags
+from source.features import lag_engine, get_feature_stream
+from source.metrics import timed
+from source.model_cache import data_fingerprint, cache_get, cache_put
 
 
 def load_data(file_path):
-    """Load time series data from a CSV file."""
+    """Load time series data from a CSV file or a candle store series."""
+    if is_store(file_path):
+        return load_frame(file_path)
     df = pd.read_csv(file_path)
     df['time'] = pd.to_datetime(df['time'])
     df.set_index('time', inplace=True)
@@ -36,12 +44,9 @@ def preprocess_data(data, target_column, additional_features):
 
 def create_lagged_features(data, target_column, lags):
     """
-    Create lagged features for the target column.
+    Create lagged features for the target column. Returns a new DataFrame.
     """
-    for lag in range(1, lags + 1):
-        data[f'{target_column}_lag_{lag}'] = data[target_column].shift(lag)
-    data.dropna(inplace=True)
-    return data
+    return lag_engine(lags, target_column).add_to(data).dropna()
 
 def split_data(features, target, train_ratio=0.8):
     """
@@ -65,30 +70,125 @@ def split_data(features, target, train_ratio=0.8):
     return X_train, X_test, y_train, y_test
 
 
-def grid_search_xgboost(X_train, y_train):
-    """Perform grid search for hyperparameter tuning."""
-    model = xgb.XGBRegressor(objective='reg:squarederror')
+XGBOOST_NTHREAD = int(os.getenv('XGBOOST_NTHREAD', 0)) or None
+
+# Part of cached model keys: bump the tag when the training code changes how models are built
+XGBOOST_BACKEND = f'native-hist-1/xgboost-{xgb.__version__}'
+
+XGBOOST_PARAM_GRID = {
+    'max_depth': [3],
+    'learning_rate': [0.1],
+    'n_estimators': [100],
+    'objective': ['reg:squarederror'],
+    'random_state': [42]
+}
+
 
-    param_grid = {
-        'max_depth': [3],
-        'learning_rate': [0.1],
-        'n_estimators': [100],
-        'objective': ['reg:squarederror'],
-        'random_state': [42]
+# XGBRegressor arguments that configure the sklearn wrapper rather than the booster
+_WRAPPER_PARAMS = {'n_estimators', 'n_jobs', 'tree_method', 'enable_categorical'}
+
+
+def _regressor_params(params, nthread=None):
+    """
+    Split a grid candidate into XGBRegressor keyword arguments, minus the ones this module sets
+    itself (tree_method='hist', enable_categorical=True, n_jobs), and the thread count to use.
+    A grid n_jobs overrides `nthread`; a tree_method other than hist raises ValueError.
+    """
+    if params.get('tree_method', 'hist') != 'hist':
+        raise ValueError(f"Only tree_method='hist' is supported, got {params['tree_method']!r}")
+    nthread = params.get('n_jobs') or nthread
+    return {key: value for key, value in params.items() if key not in ('n_jobs', 'tree_method', 'enable_categorical')}, nthread
+
+
+def _booster_params(params, nthread=None):
+    """
+    Translate sklearn-style XGBRegressor params into native xgb.train params using the hist method.
+    The mapping is the one XGBRegressor.fit uses, so every grid key reaches the booster;
+    keys XGBRegressor does not accept, or that only configure fitting, raise ValueError.
+    """
+    known = set(xgb.XGBRegressor().get_xgb_params())
+    unknown = sorted(set(params) - known - _WRAPPER_PARAMS)
+    if unknown:
+        raise ValueError(f"Unsupported XGBoost parameter(s) in grid: {unknown}")
+    params, nthread = _regressor_params(params, nthread)
+
+    booster_params = {
+        key: value for key, value in xgb.XGBRegressor(**params).get_xgb_params().items()
+        if value is not None and key not in _WRAPPER_PARAMS
     }
+    booster_params.setdefault('objective', 'reg:squarederror')
+    booster_params['tree_method'] = 'hist'
+    if nthread:
+        booster_params['nthread'] = nthread
+    return booster_params
+
+
+def _to_regressor(booster, params, nthread=None):
+    """Wrap a trained Booster in an XGBRegressor so callers keep the sklearn predict/get_params API."""
+    params, nthread = _regressor_params(params, nthread)
+    model = xgb.XGBRegressor(
+        **{**params, 'n_estimators': booster.num_boosted_rounds()},
+        tree_method='hist', n_jobs=nthread, enable_categorical=True,
+    )
+    model.load_model(bytearray(booster.save_raw(raw_format='ubj')))
+    return model
 
-    if len(X_train) < 2: 
-        print("Training data too small for cross-validation. Training without CV.")
-        model.fit(X_train, y_train)
-        return model
 
-    cv_splits = min(3, len(X_train))  
-    print(f"Using {cv_splits} splits for cross-validation.")
+def grid_search_xgboost(X_train, y_train, param_grid=None, nthread=None, early_stopping_rounds=None, validation_fraction=0.2):
+    """
+    Perform grid search for hyperparameter tuning.
+
+    Training uses the native hist booster on QuantileDMatrix inputs that are built once and
+    reused across candidates. A single-point grid without early stopping is trained directly,
+    with no cross-validation. Otherwise candidates are scored on the last `validation_fraction`
+    of the (time-ordered) training rows, optionally with early stopping, and the winner is refit
+    on all training rows.
+    """
+    candidates = list(ParameterGrid(param_grid or XGBOOST_PARAM_GRID))
+    nthread = nthread or XGBOOST_NTHREAD
 
-    grid_search = GridSearchCV(estimator=model, param_grid=param_grid, cv=cv_splits, scoring='neg_mean_squared_error')
-    grid_search.fit(X_train, y_train)
+    if len(X_train) < 3:
+        print("Training data too small for validation. Training without it.")
+        params, nthread = _regressor_params(candidates[0], nthread)
+        model = xgb.XGBRegressor(**params, tree_method='hist', n_jobs=nthread, enable_categorical=True)
+        model.fit(X_train, y_train)
+        return model
 
-    return grid_search.best_estimator_
+    if len(candidates) == 1 and not early_stopping_rounds:
+        params = candidates[0]
+        dtrain = xgb.QuantileDMatrix(X_train, y_train, nthread=nthread, enable_categorical=True)
+        booster = xgb.train(_booster_params(params, nthread), dtrain, num_boost_round=params.get('n_estimators', 100))
+        return _to_regressor(booster, params, nthread)
+
+    split_idx = min(len(X_train) - 1, max(1, int(len(X_train) * (1 - validation_fraction))))
+    print(f"Scoring {len(candidates)} candidate(s) on the last {len(X_train) - split_idx} training rows.")
+    dpart = xgb.QuantileDMatrix(X_train.iloc[:split_idx], y_train.iloc[:split_idx], nthread=nthread, enable_categorical=True)
+    dval = xgb.QuantileDMatrix(X_train.iloc[split_idx:], y_train.iloc[split_idx:], ref=dpart, nthread=nthread, enable_categorical=True)
+
+    best = None
+    for params in candidates:
+        booster = xgb.train(
+            _booster_params(params, nthread), dpart,
+            num_boost_round=params.get('n_estimators', 100),
+            evals=[(dval, 'validation')],
+            early_stopping_rounds=early_stopping_rounds,
+            verbose_eval=False,
+        )
+        rounds = booster.best_iteration + 1 if early_stopping_rounds else booster.num_boosted_rounds()
+        preds = booster.predict(dval, iteration_range=(0, rounds))
+        rmse = evaluate_model(y_train.iloc[split_idx:], preds)
+        if best is None or rmse < best[0]:
+            best = (rmse, params, rounds, booster)
+
+    rmse, params, rounds, booster = best
+    print(f"Best XGBoost params: {params} ({rounds} rounds, validation RMSE {rmse})")
+    if len(candidates) == 1:
+        # Early stopping only: keep the model trained on the earlier rows.
+        return _to_regressor(booster[:rounds], params, nthread)
+
+    dtrain = xgb.QuantileDMatrix(X_train, y_train, ref=dpart, nthread=nthread, enable_categorical=True)
+    booster = xgb.train(_booster_params(params, nthread), dtrain, num_boost_round=rounds)
+    return _to_regressor(booster, params, nthread)
 
 
 def make_predictions(best_model, X_test):
@@ -100,28 +200,29 @@ def evaluate_model(y_test, preds):
     """Evaluate the model's performance using RMSE."""
     return np.sqrt(mean_squared_error(y_test, preds))
 
-def train_live_model(data_dir=None, file_path=None, symbol='USD', target_column='close', train_ratio=0.8, save_model_path=None, lags=1):
+def train_live_model(data_dir=None, file_path=None, symbol='USD', target_column='close', train_ratio=0.8, save_model_path=None, lags=1, data=None):
     """
     Train an XGBoost model using lagged features for the specified target column.
-    Can train using a single file or multiple files in a directory.
+    Can train using a DataFrame, a single file or multiple files in a directory.
     """
     # Load data from a directory or a single file
-    if data_dir:
+    if data is not None:
+        data = data.copy()
+    elif data_dir:
         all_files = [os.path.join(data_dir, f) for f in os.listdir(data_dir) if f.endswith('.csv') and symbol in f]
-        combined_data = pd.DataFrame()
+        frames = []
         for file in all_files:
             try:
-                df = load_data(file)
-                combined_data = pd.concat([combined_data, df], ignore_index=True)
+                frames.append(load_data(file))
             except Exception as e:
                 print(f"Error reading file {file}: {e}")
-        if combined_data.empty:
+        if not frames:
             raise ValueError(f"No data found in directory: {data_dir} for symbol: {symbol}")
-        data = combined_data
+        data = pd.concat(frames, ignore_index=True)
     elif file_path:
         data = load_data(file_path)
     else:
-        raise ValueError("Either 'data_dir' or 'file_path' must be provided.")
+        raise ValueError("Either 'data', 'data_dir' or 'file_path' must be provided.")
 
     # Prepare data
     data.rename(columns={target_column: 'USD'}, inplace=True)
@@ -159,11 +260,13 @@ def train_live_model(data_dir=None, file_path=None, symbol='USD', target_column=
 
     return predictions, metrics
 
-def xgboost_forecast(file_path, target_column='close', train_ratio=0.8):
+def xgboost_forecast(file_path, target_column='close', train_ratio=0.8, use_cache=True):
     """
     Forecast using XGBoost without creating lagged features.
+    Fitted models are cached on disk keyed by the data content and hyperparameters.
     """
-    data = load_data(file_path)
+    with timed('load', model='xgboost'):
+        data = load_data(file_path)
     print(f"Columns in dataset: {data.columns}")
     print(f"Loaded data shape: {data.shape}")
 
@@ -173,8 +276,20 @@ def xgboost_forecast(file_path, target_column='close', train_ratio=0.8):
 
     X_train, X_test, y_train, y_test = split_data(features, target, train_ratio=train_ratio)
 
-    best_model = grid_search_xgboost(X_train, y_train)
-    predictions = make_predictions(best_model, X_test)
+    cache_key = data_fingerprint([X_train, y_train, X_test, y_test], {
+        'model': 'xgboost', 'target_column': target_column,
+        'param_grid': XGBOOST_PARAM_GRID, 'backend': XGBOOST_BACKEND,
+    })
+    if use_cache:
+        cached = cache_get(cache_key)
+        if cached is not None:
+            print("Using cached XGBoost model")
+            return cached['result'].copy(), dict(cached['metrics'])
+
+    with timed('fit', model='xgboost'):
+        best_model = grid_search_xgboost(X_train, y_train)
+    with timed('predict', model='xgboost'):
+        predictions = make_predictions(best_model, X_test)
 
     ''' 
     if save_model_path:
@@ -206,40 +321,39 @@ def xgboost_forecast(file_path, target_column='close', train_ratio=0.8):
     })
     result.to_csv('xgboost_predictions_no_lags.csv', index=False)
 
-    return result, metrics
+    if use_cache:
+        cache_put(cache_key, {
+            'model': best_model,
+            'params': best_model.get_params(),
+            'metrics': metrics,
+            'result': result,
+        })
 
-rolling_buffer = []
+    return result, metrics
 
-def predict_usd_realtime(model_path, live_data, lags=2):
+def predict_usd_realtime(model_path, live_data, lags=2, symbol='ETH', currency='USD'):
     """
     Predict real-time cryptocurrency values using a pre-trained model with lagged features.
+    Lag state is kept in a feature stream per (symbol, currency, model), so concurrent streams do not mix.
     """
-    global rolling_buffer
-
-    model_package = joblib.load(model_path)
-    model = model_package['model']
-    required_features = model_package['features']
+    required_features = get_model_package(model_path)['features']
 
-    rolling_buffer.append(live_data['USD'])
-    
-    if len(rolling_buffer) > lags:
-        rolling_buffer = rolling_buffer[-lags:]
-    
-    if len(rolling_buffer) < lags:
-        print(f"Prediction Error: Waiting for enough data to generate lagged features. "
-              f"Current buffer size: {len(rolling_buffer)}, Required: {lags}")
-        return None
+    # Check if the features match the model's requirements
+    if set(f'USD_lag_{i+1}' for i in range(lags)) != set(required_features):
+        raise ValueError(f"Feature shape mismatch, expected: {len(required_features)}, got: {lags}")
 
-    lagged_features = {f'USD_lag_{i+1}': rolling_buffer[-(i+1)] for i in range(lags)}
-    lagged_df = pd.DataFrame([lagged_features])
+    stream = get_feature_stream((symbol, currency, model_path), lag_engine(lags))
+    with stream.lock:
+        stream.update(live_data[currency] if currency in live_data else live_data['USD'])
 
-    # Check if the features match the model's requirements
-    if set(lagged_df.columns) != set(required_features):
-        raise ValueError(f"Feature shape mismatch, expected: {len(required_features)}, got: {len(lagged_df.columns)}")
+        lag_values = stream.next_lags(lags)
+        if lag_values is None:
+            print(f"Prediction Error: Waiting for enough data to generate lagged features. "
+                  f"Current buffer size: {stream.count}, Required: {lags}")
+            return None
 
-    # Make the prediction
-    prediction = model.predict(lagged_df.values)
-    return float(prediction[0])
+        # Make the prediction
+        return predict_lags(model_path, lag_values)
     
 def train_usd_model_future_steps(file_path, target_column='close', train_ratio=0.8, save_model_path=None, lags=1):
     """
@@ -272,29 +386,143 @@ def train_usd_model_future_steps(file_path, target_column='close', train_ratio=0
 
     return best_model
 
+
+def build_lag_matrix(values, lags):
+    """
+    Stack the last `lags` observations for every position into one matrix in a single
+    vectorized pass. Row i holds values[i + lags - 1], values[i + lags - 2], ... (newest first),
+    matching the USD_lag_1..USD_lag_n order used at prediction time.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < lags:
+        return np.empty((0, lags))
+    return np.lib.stride_tricks.sliding_window_view(values, lags)[:, ::-1]
+
+
+def build_horizon_targets(values, lags, horizons):
+    """
+    Targets aligned with build_lag_matrix rows: column h-1 is the value h steps after the row's newest lag.
+    Rows without a full set of future values are dropped, so the result has len(values) - lags - horizons + 1 rows.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) < lags + horizons:
+        return np.empty((0, horizons))
+    return np.lib.stride_tricks.sliding_window_view(values[lags:], horizons)
+
+
+def relative_lags(lag_matrix):
+    """
+    Express every lag as a return relative to the newest one (lag_k / lag_1 - 1), so the
+    features do not depend on the price level. Trees cannot extrapolate beyond the levels
+    seen in training; returns keep recent prices inside the range the model was fit on.
+    """
+    lag_matrix = np.atleast_2d(np.asarray(lag_matrix, dtype=np.float64))
+    return lag_matrix / lag_matrix[:, :1] - 1.0
+
+
+def _multi_horizon_regressor():
+    return xgb.XGBRegressor(
+        objective='reg:squarederror', max_depth=3, learning_rate=0.1, n_estimators=100,
+        random_state=42, tree_method='hist', multi_strategy='one_output_per_tree',
+    )
+
+
+def train_multi_horizon_model(values, horizons=10, lags=3, train_ratio=0.8):
+    """
+    Train one multi-output XGBoost model that predicts the next `horizons` values directly
+    from the last `lags` observations. The model learns the return of each horizon relative
+    to lag_1 (see predict_horizons for the conversion back to prices).
+
+    The holdout metrics come from a model fit on the first `train_ratio` of the rows; the
+    returned model is then refit on every row, so forecasts start from the latest candles.
+    """
+    if horizons < 1 or lags < 1:
+        raise ValueError(f"horizons and lags must be at least 1, got {horizons} and {lags}.")
+    targets = build_horizon_targets(values, lags, horizons)
+    lag_matrix = build_lag_matrix(values, lags)[:len(targets)]
+    if len(targets) < 2:
+        raise ValueError(f"Not enough data for {horizons}-step forecasting with {lags} lags.")
+
+    features = relative_lags(lag_matrix)
+    returns = targets / lag_matrix[:, :1] - 1.0
+
+    split_idx = max(1, int(len(targets) * train_ratio))
+    metrics = {}
+    if split_idx < len(targets):
+        model = _multi_horizon_regressor()
+        model.fit(features[:split_idx], returns[:split_idx])
+        package = {'model': model, 'horizons': horizons}
+        preds = predict_horizons(package, lag_matrix[split_idx:])
+        y_test = targets[split_idx:]
+        metrics = {
+            "RMSE": evaluate_model(y_test.ravel(), preds.ravel()),
+            "MSE": mean_squared_error(y_test.ravel(), preds.ravel()),
+            "MAE": mean_absolute_error(y_test.ravel(), preds.ravel()),
+            "MdAE": median_absolute_error(y_test.ravel(), preds.ravel()),
+        }
+
+    model = _multi_horizon_regressor()
+    model.fit(features, returns)
+
+    return {
+        'model': model,
+        'features': [f'USD_lag_{i}' for i in range(1, lags + 1)],
+        'lags': lags,
+        'horizons': horizons,
+        'target': 'return',
+        'metrics': metrics,
+    }
+
+
+def predict_horizons(model_package, lag_matrix):
+    """
+    Predict every horizon for many series at once. `lag_matrix` has one row per series
+    (newest lag first) in price units; the result, also in price units, has shape
+    (n_series, horizons).
+    """
+    lag_matrix = np.atleast_2d(np.asarray(lag_matrix, dtype=np.float64))
+    returns = model_package['model'].predict(relative_lags(lag_matrix))
+    return lag_matrix[:, :1] * (1.0 + returns.reshape(len(lag_matrix), model_package['horizons']))
+
+
+def forecast_future_steps(file_path, steps=10, target_column='close', lags=3, use_cache=True):
+    """
+    Forecast the next `steps` candles after the end of the file with a direct multi-horizon model.
+    Returns a DataFrame of future times and predicted values plus the holdout metrics.
+    """
+    with timed('load', model='xgboost_multi_horizon'):
+        data = load_data(file_path)
+    series = data[target_column].dropna()
+
+    cache_key = data_fingerprint([series], {'model': 'xgboost_multi_horizon', 'steps': steps, 'lags': lags, 'target': 'return', 'backend': XGBOOST_BACKEND})
+    package = cache_get(cache_key) if use_cache else None
+    if package is None:
+        with timed('fit', model='xgboost_multi_horizon'):
+            package = train_multi_horizon_model(series.values, horizons=steps, lags=lags)
+        if use_cache:
+            cache_put(cache_key, package)
+
+    with timed('predict', model='xgboost_multi_horizon'):
+        preds = predict_horizons(package, build_lag_matrix(series.values[-lags:], lags))[0]
+    step = series.index.to_series().diff().median()
+    result = pd.DataFrame({
+        'time': [series.index[-1] + step * h for h in range(1, steps + 1)],
+        'predicted': preds,
+    })
+    return result, dict(package['metrics'])
+
     
 def predict_usd_next_step(model_path, live_data, previous_values):
     """
     Predict the next USD value based on live data and lagged features.
     """
     try:
-        model_package = joblib.load(model_path)
-        model = model_package['model']
-        required_features = model_package['features']  
-        lags = model_package['lags']  
-
-        print(f"Loaded model from: {model_path}")
-        print(f"Required features: {required_features}")
-        print(f"Lags required: {lags}")
+        lags = get_model_package(model_path)['lags']
 
         if len(previous_values) < lags:
             raise ValueError(f"Not enough previous values for prediction. Expected {lags}, got {len(previous_values)}.")
 
-        feature_row = {f'USD_lag_{i+1}': previous_values[-(i+1)] for i in range(lags)}
-        live_df = pd.DataFrame([feature_row])
-
-        prediction = model.predict(live_df.values)
-        return float(prediction[0])
+        return predict_lags(model_path, previous_values[::-1])
     except KeyError as e:
         raise ValueError(f"Missing required feature in live data: {e}")
     except Exception as e:
@@ -306,18 +534,7 @@ def predict_usd_future_step(model_path, live_data, previous_values):
     Predict the future USD value (e.g., 5 minutes ahead) based on live data and lagged features.
     """
     try:
-        model_package = joblib.load(model_path)
-        model = model_package['model']
-        required_features = model_package['features']  
-
-        if len(previous_values) < len(required_features):
-            raise ValueError(f"Not enough previous values for prediction. Expected {len(required_features)}, got {len(previous_values)}.")
-
-        feature_row = {f'USD_lag_{i+1}': previous_values[-(i+1)] for i in range(len(required_features))}
-        live_df = pd.DataFrame([feature_row])
-
-        prediction = model.predict(live_df.values)
-        return float(prediction[0])
+        return predict_lags(model_path, previous_values[::-1])
     except KeyError as e:
         raise ValueError(f"Missing required feature in live data: {e}")
     except Exception as e:
@@ -368,20 +585,181 @@ def combine_data_from_directory(data_dir, target_column='close'):
 
 def train_model_from_directory(data_dir, target_column='close', save_model_path=None, lags=1):
     """
-    Combine data from the directory, save it, and train the model.
+    Combine data from the directory and train the model.
     """
-    # Combine data from the directory
     combined_data = combine_data_from_directory(data_dir, target_column)
+    if combined_data.empty:
+        raise ValueError(f"No data found in directory: {data_dir}")
+    if 'time' in combined_data.columns:
+        combined_data.set_index('time', inplace=True)
 
-    # Save combined data to a temporary CSV file
-    combined_file_path = os.path.join(data_dir, 'combined_data.csv')
-    combined_data.to_csv(combined_file_path, index=False)
-    print(f"Combined data saved to: {combined_file_path}")
-
-    # Call train_live_model with the combined file path
-    train_live_model(
-        file_path=combined_file_path, 
+    return train_live_model(
+        data=combined_data,
         target_column=target_column,
         save_model_path=save_model_path,
         lags=lags
     )
+
+
+SERIES_FILE_PATTERN = re.compile(r'^crypto_data_([A-Za-z0-9]+)_([A-Za-z0-9]+)(?:_\w+)?\.csv$')
+STORE_SERIES_PATTERN = re.compile(r'^([A-Za-z0-9]+)_([A-Za-z0-9]+)_(\d+)m$')
+
+
+def find_series(data_dir='data', store_dir=None, symbol=None, aggregate=10):
+    """
+    Map every (symbol, currency) pair found under `data_dir` to its data source.
+    Candle store series win over crypto_data_<SYMBOL>_<CURRENCY>*.csv files for the same pair;
+    of a pair's stored series the `aggregate`-minute one is used, else the finest.
+    """
+    sources = {}
+    if os.path.isdir(data_dir):
+        for filename in sorted(os.listdir(data_dir)):
+            match = SERIES_FILE_PATTERN.match(filename)
+            if match:
+                sources.setdefault(match.groups(), os.path.join(data_dir, filename))
+
+    store_dir = store_dir or STORE_DIR
+    stored = {}
+    if os.path.isdir(store_dir):
+        for name in sorted(os.listdir(store_dir)):
+            match = STORE_SERIES_PATTERN.match(name)
+            path = os.path.join(store_dir, name)
+            if match and is_store(path):
+                pair_symbol, pair_currency, minutes = match.groups()
+                stored.setdefault((pair_symbol, pair_currency), {})[int(minutes)] = path
+    for pair, paths in stored.items():
+        sources[pair] = paths.get(aggregate, paths[min(paths)])
+
+    if symbol:
+        sources = {pair: path for pair, path in sources.items() if pair[0] == symbol}
+    return dict(sorted(sources.items()))
+
+
+def _read_target(path, target_column):
+    """Read only the target column of one series as a float64 array with NaNs removed."""
+    if is_store(path):
+        values = np.asarray(read_arrays(path)[target_column], dtype=np.float64)
+    else:
+        values = pd.read_csv(path, usecols=[target_column])[target_column].to_numpy(dtype=np.float64)
+    return values[~np.isnan(values)]
+
+
+def build_global_matrix(sources, target_column='close', lags=3, train_ratio=0.8):
+    """
+    Stack lag features for many series into one preallocated matrix.
+
+    Each series contributes len(values) - lags rows with USD_lag_1..USD_lag_n (newest first) and
+    a categorical `pair` column ("SYMBOL_CURRENCY"). Lags never cross series boundaries. Lags and
+    target are returns relative to lag_1 (see relative_lags), so pairs priced orders of magnitude
+    apart share one scale. The split is per series: the last (1 - train_ratio) of every series
+    goes to the test set, so the holdout stays time-ordered for each pair.
+    Returns features, target returns, a boolean train mask and the lag_1 price of every row
+    (target price = lag_1 * (1 + return)).
+    """
+    series = {}
+    for pair, path in sources.items():
+        try:
+            values = _read_target(path, target_column)
+        except Exception as e:
+            print(f"Skipping {path}: {e}")
+            continue
+        if len(values) > lags:
+            series[f'{pair[0]}_{pair[1]}'] = values
+
+    if not series:
+        raise ValueError("No series with enough data to train a global model.")
+
+    total = sum(len(values) - lags for values in series.values())
+    X = np.empty((total, lags), dtype=np.float64)
+    y = np.empty(total, dtype=np.float64)
+    base = np.empty(total, dtype=np.float64)
+    codes = np.empty(total, dtype=np.int32)
+    train_mask = np.empty(total, dtype=bool)
+
+    row = 0
+    for code, values in enumerate(series.values()):
+        n = len(values) - lags
+        lag_matrix = build_lag_matrix(values[:-1], lags)
+        X[row:row + n] = relative_lags(lag_matrix)
+        base[row:row + n] = lag_matrix[:, 0]
+        y[row:row + n] = values[lags:] / lag_matrix[:, 0] - 1.0
+        codes[row:row + n] = code
+        train_mask[row:row + n] = np.arange(n) < max(1, int(n * train_ratio))
+        row += n
+
+    features = pd.DataFrame(X, columns=[f'USD_lag_{i}' for i in range(1, lags + 1)])
+    features['pair'] = pd.Categorical.from_codes(codes, categories=list(series))
+    return features, pd.Series(y, name='USD'), train_mask, base
+
+
+def train_global_model(data_dir='data', target_column='close', lags=3, train_ratio=0.8, save_model_path=None, symbol=None, store_dir=None):
+    """
+    Train a single XGBoost model on every pair found under `data_dir` (and the candle store),
+    with the pair as a categorical feature. The model learns next-step returns; holdout metrics,
+    overall and per pair, are in price units.
+    """
+    sources = find_series(data_dir, store_dir=store_dir, symbol=symbol)
+    with timed('load', model='xgboost_global'):
+        features, target, train_mask, base = build_global_matrix(sources, target_column, lags, train_ratio)
+    print(f"Global model: {len(features)} rows from {len(features['pair'].cat.categories)} series")
+
+    X_train, y_train = features[train_mask], target[train_mask]
+    X_test, y_test = features[~train_mask], target[~train_mask]
+    with timed('fit', model='xgboost_global'):
+        best_model = grid_search_xgboost(X_train, y_train)
+
+    metrics = {}
+    if len(X_test):
+        test_base = base[~train_mask]
+        y_test = pd.Series(test_base * (1.0 + y_test.to_numpy()), name='USD')
+        predictions = test_base * (1.0 + make_predictions(best_model, X_test))
+        metrics = {
+            "RMSE": evaluate_model(y_test, predictions),
+            "MSE": mean_squared_error(y_test, predictions),
+            "MAE": mean_absolute_error(y_test, predictions),
+            "MdAE": median_absolute_error(y_test, predictions),
+            "per_pair_RMSE": {
+                pair: evaluate_model(y_test[mask], predictions[mask])
+                for pair, mask in ((pair, (X_test['pair'] == pair).to_numpy()) for pair in features['pair'].cat.categories)
+                if mask.any()
+            },
+        }
+
+    model_package = {
+        'model': best_model,
+        'features': list(features.columns),
+        'lags': lags,
+        'pairs': list(features['pair'].cat.categories),
+        'target': 'return',
+        'metrics': metrics,
+    }
+    if save_model_path:
+        os.makedirs(os.path.dirname(save_model_path) or '.', exist_ok=True)
+        joblib.dump(model_package, save_model_path)
+        print(f"Global model saved to: {save_model_path}")
+    return model_package
+
+
+def predict_global(model_package, pair_lags):
+    """
+    Predict the next value for many pairs with one call.
+    `pair_lags` maps (symbol, currency) to its most recent values, newest first.
+    Returns a dict with the same keys, in price units.
+    """
+    lags = model_package['lags']
+    pairs = list(pair_lags)
+    unknown = [pair for pair in pairs if f'{pair[0]}_{pair[1]}' not in model_package['pairs']]
+    if unknown:
+        raise ValueError(f"Global model was not trained on: {unknown}")
+
+    X = np.empty((len(pairs), lags), dtype=np.float64)
+    for i, pair in enumerate(pairs):
+        values = np.asarray(pair_lags[pair], dtype=np.float64)
+        if len(values) < lags:
+            raise ValueError(f"Not enough previous values for {pair}. Expected {lags}, got {len(values)}.")
+        X[i] = values[:lags]
+
+    features = pd.DataFrame(relative_lags(X), columns=model_package['features'][:lags])
+    features['pair'] = pd.Categorical([f'{s}_{c}' for s, c in pairs], categories=model_package['pairs'])
+    predictions = X[:, 0] * (1.0 + make_predictions(model_package['model'], features))
+    return dict(zip(pairs, predictions.tolist()))
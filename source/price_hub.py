@@ -0,0 +1,105 @@
+import asyncio
+import queue
+import threading
+from source.live_client import LiveClient
+
+_lock = threading.Lock()
+_subscribers = {}
+_hub = None
+
+
+def _run(client, stop):
+    """Poll every subscribed pair with one LiveClient and publish each tick to its pair's subscribers."""
+    async def pump():
+        try:
+            async for ticks in client.stream(stop=stop):
+                for tick in ticks:
+                    publish((tick.symbol, tick.currency), tick.to_dict(), source=stop)
+        finally:
+            await client.close()
+
+    asyncio.run(pump())
+
+
+def publish(key, tick, source=None):
+    """
+    Deliver a tick to every subscriber of `key`. A subscriber whose queue is full is dropped:
+    its queue is emptied and a None sentinel is left so the reader knows to stop.
+    `source` lets a stopped hub avoid publishing into its replacement.
+    """
+    with _lock:
+        if source is not None and (_hub is None or _hub['stop'] is not source):
+            return
+        subscribers = _subscribers.get(key)
+        if not subscribers:
+            return
+        for subscriber in list(subscribers):
+            try:
+                subscriber.put_nowait(tick)
+            except queue.Full:
+                subscribers.discard(subscriber)
+                _drain(subscriber)
+                subscriber.put_nowait(None)
+                print(f"Dropped slow price subscriber for {key[0]}/{key[1]}")
+        if not subscribers:
+            _remove_pair(key)
+
+
+def _drain(q):
+    while True:
+        try:
+            q.get_nowait()
+        except queue.Empty:
+            return
+
+
+def _remove_pair(key):
+    """Forget a pair nobody listens to; stop the hub once no pair is left. Call with _lock held."""
+    global _hub
+    del _subscribers[key]
+    if _hub is None:
+        return
+    _hub['client'].pairs = list(_subscribers)
+    if not _subscribers:
+        _hub['stop'].set()
+        _hub = None
+
+
+def subscribe(api_key, symbol='ETH', currency='USD', interval=5, maxsize=100):
+    """
+    Register a bounded queue for (symbol, currency) ticks. Every subscribed pair is polled by
+    one shared LiveClient (a single pricemulti request per poll), started on the first
+    subscription with its `interval`.
+    """
+    global _hub
+    key = (symbol, currency)
+    subscriber = queue.Queue(maxsize=maxsize)
+    with _lock:
+        _subscribers.setdefault(key, set()).add(subscriber)
+        if _hub is None:
+            client = LiveClient(api_key, list(_subscribers), interval=interval)
+            stop = threading.Event()
+            thread = threading.Thread(target=_run, args=(client, stop), daemon=True, name='price-hub')
+            _hub = {'client': client, 'stop': stop, 'thread': thread}
+            thread.start()
+        else:
+            _hub['client'].pairs = list(_subscribers)
+    return subscriber
+
+
+def unsubscribe(symbol, currency, subscriber):
+    """Remove a subscriber; a pair stops being polled once nobody is listening."""
+    key = (symbol, currency)
+    with _lock:
+        subscribers = _subscribers.get(key)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if not subscribers:
+            _remove_pair(key)
+
+
+def hub_stats():
+    """Number of subscribers per subscribed (symbol, currency) pair."""
+    with _lock:
+        return {f'{symbol}/{currency}': len(subscribers) for (symbol, currency), subscribers in _subscribers.items()}
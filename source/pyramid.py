@@ -0,0 +1,141 @@
+import os
+import re
+import numpy as np
+import pandas as pd
+from source.candle_store import COLUMNS, STORE_DIR, append_candles, is_store, last_timestamp, read_arrays, store_path
+
+BASE_AGGREGATE = int(os.getenv('BASE_AGGREGATE', 5))
+LEVELS = tuple(int(level) for level in os.getenv('PYRAMID_LEVELS', '10,15,60,1440').split(','))
+
+_SERIES_PATTERN = re.compile(r'^(?P<symbol>[A-Za-z0-9]+)_(?P<currency>[A-Za-z0-9]+)_(?P<aggregate>\d+)m$')
+
+
+def stored_aggregates(symbol, currency, root=None):
+    """Aggregates (in minutes) of every candle store series held for a pair, finest first."""
+    root = root or STORE_DIR
+    if not os.path.isdir(root):
+        return []
+    aggregates = []
+    for name in os.listdir(root):
+        match = _SERIES_PATTERN.match(name)
+        if match and match['symbol'] == symbol and match['currency'] == currency and is_store(os.path.join(root, name)):
+            aggregates.append(int(match['aggregate']))
+    return sorted(aggregates)
+
+
+def fetch_aggregate(aggregate):
+    """
+    The aggregate to download when `aggregate` candles are requested: the BASE_AGGREGATE series
+    whenever it divides the request, so every pyramid level can be derived from what is stored.
+    """
+    return BASE_AGGREGATE if aggregate % BASE_AGGREGATE == 0 else aggregate
+
+
+def source_aggregate(symbol, currency, aggregate, root=None):
+    """
+    The coarsest stored series finer than `aggregate` that divides it evenly (so 1h comes
+    from 15m rather than from 1m), or None if the aggregate cannot be derived locally.
+    """
+    candidates = [a for a in stored_aggregates(symbol, currency, root) if a < aggregate and aggregate % a == 0]
+    return candidates[-1] if candidates else None
+
+
+def resample_arrays(arrays, aggregate, complete_until=None):
+    """
+    Aggregate sorted candle arrays into `aggregate`-minute OHLCV buckets aligned to the epoch
+    (daily buckets start at 00:00 UTC). Buckets ending after `complete_until` (epoch seconds)
+    are dropped, so only finished buckets are returned. Returns a DataFrame with a 'time' column.
+    """
+    times = np.asarray(arrays['time'], dtype=np.int64)
+    if len(times) == 0:
+        return pd.DataFrame(columns=('time',) + COLUMNS)
+
+    span = aggregate * 60
+    buckets = times - times % span
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = np.append(starts[1:], len(times)) - 1
+    bucket_times = buckets[starts]
+
+    volumes = {column: np.nan_to_num(np.asarray(arrays[column], dtype=np.float64)) for column in ('volumefrom', 'volumeto')}
+    frame = pd.DataFrame({
+        'time': bucket_times,
+        'open': np.asarray(arrays['open'], dtype=np.float64)[starts],
+        'high': np.fmax.reduceat(np.asarray(arrays['high'], dtype=np.float64), starts),
+        'low': np.fmin.reduceat(np.asarray(arrays['low'], dtype=np.float64), starts),
+        'close': np.asarray(arrays['close'], dtype=np.float64)[ends],
+        'volumefrom': np.add.reduceat(volumes['volumefrom'], starts),
+        'volumeto': np.add.reduceat(volumes['volumeto'], starts),
+    })
+    if complete_until is not None:
+        frame = frame[frame['time'] + span <= complete_until]
+    return frame
+
+
+def update_level(symbol, currency, aggregate, root=None):
+    """
+    Bring the `aggregate` series of a pair up to date from its source series, reading only
+    source candles newer than the last stored bucket. A bucket is written once the source
+    has a candle in its final slot, so stored buckets are never partial.
+    Returns the number of buckets appended (0 if the level cannot be derived).
+    """
+    source = source_aggregate(symbol, currency, aggregate, root)
+    if source is None:
+        return 0
+    source_path = store_path(symbol, currency, source, root)
+    target_path = store_path(symbol, currency, aggregate, root)
+
+    source_last = last_timestamp(source_path)
+    if source_last is None:
+        return 0
+    last = last_timestamp(target_path)
+    start = None if last is None else last + aggregate * 60
+    if start is not None and start > source_last:
+        return 0
+
+    arrays = read_arrays(source_path, start=start)
+    buckets = resample_arrays(arrays, aggregate, complete_until=source_last + source * 60)
+    return append_candles(target_path, buckets)
+
+
+def update_pyramid(symbol, currency, levels=LEVELS, root=None):
+    """
+    Refresh every pyramid level and any other derived series of a pair after new base candles
+    arrive. Levels are processed finest first, so each one reads from an up-to-date source.
+    Returns {aggregate: buckets appended}.
+    """
+    stored = stored_aggregates(symbol, currency, root)
+    if not stored:
+        return {}
+    targets = sorted(set(levels) | set(stored))
+    appended = {}
+    for aggregate in targets:
+        if aggregate > stored[0] and aggregate % stored[0] == 0:
+            appended[aggregate] = update_level(symbol, currency, aggregate, root)
+    return appended
+
+
+def ensure_aggregate(symbol, currency, aggregate, root=None):
+    """
+    Return the store path of the `aggregate` series for a pair, deriving or topping it up from
+    finer stored candles when possible (no network access). Returns None when the pair has no
+    stored series the aggregate can be built from.
+    """
+    path = store_path(symbol, currency, aggregate, root)
+    if source_aggregate(symbol, currency, aggregate, root) is not None:
+        update_level(symbol, currency, aggregate, root)
+    return path if is_store(path) else None
+
+
+def can_derive(symbol, currency, aggregate, since=None, until=None, root=None):
+    """
+    True if `aggregate` can be built from finer stored candles covering `since` to `until`
+    (epoch seconds; either may be None).
+    """
+    source = source_aggregate(symbol, currency, aggregate, root)
+    if source is None:
+        return False
+    path = store_path(symbol, currency, source, root)
+    first = read_arrays(path)['time'][:1]
+    if len(first) == 0:
+        return False
+    return (since is None or int(first[0]) <= since) and (until is None or last_timestamp(path) >= until)
@@ -0,0 +1,59 @@
+import os
+import threading
+import traceback
+from source.api import fetch_new_candles
+from source.metrics import inc
+from source.pyramid import BASE_AGGREGATE, update_pyramid
+from source import snapshots
+
+_lock = threading.Lock()
+_refreshers = {}
+
+
+def _run(key, api_key, aggregate, interval, stop):
+    """Append any new candles for one pair every `interval` seconds and invalidate what depends on them."""
+    symbol, currency = key
+    while not stop.is_set():
+        try:
+            rows = fetch_new_candles(api_key, symbol, currency, aggregate)
+        except Exception:
+            print(f"Refreshing {symbol}/{currency} failed: {traceback.format_exc()}")
+            rows = 0
+        if rows:
+            print(f"Appended {rows} new candle(s) for {symbol}/{currency}")
+            inc('candles_appended_total', rows, symbol=symbol, currency=currency)
+            update_pyramid(symbol, currency)
+            snapshots.invalidate(symbol, currency)
+            snapshots.notify()
+        stop.wait(interval)
+
+
+def start_refresher(api_key, symbol, currency, aggregate=BASE_AGGREGATE, interval=None):
+    """
+    Start the background refresher for a pair (once per pair). It keeps the base series
+    (BASE_AGGREGATE minutes) current and derives the pyramid levels from it, polling every
+    `interval` seconds, by default REFRESH_INTERVAL or one candle period.
+    """
+    key = (symbol, currency)
+    interval = interval or float(os.getenv('REFRESH_INTERVAL', 0)) or aggregate * 60
+    with _lock:
+        if key in _refreshers:
+            return
+        stop = threading.Event()
+        thread = threading.Thread(target=_run, args=(key, api_key, aggregate, interval, stop),
+                                  name=f'refresh-{symbol}-{currency}', daemon=True)
+        _refreshers[key] = {'stop': stop, 'thread': thread}
+    thread.start()
+
+
+def stop_refresher(symbol, currency):
+    with _lock:
+        refresher = _refreshers.pop((symbol, currency), None)
+    if refresher is not None:
+        refresher['stop'].set()
+        refresher['thread'].join()
+
+
+def refreshing_pairs():
+    with _lock:
+        return list(_refreshers)
@@ -0,0 +1,42 @@
+import threading
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Fixed-capacity float64 ring buffer.
+
+    Every value is written twice, at i and i + capacity, so the most recent n values are always
+    one contiguous slice of the backing array and can be returned as a view without copying.
+    Hold `lock` across append/latest when several threads share a buffer.
+    """
+
+    def __init__(self, capacity):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.lock = threading.RLock()
+        self._data = np.zeros(2 * capacity, dtype=np.float64)
+        self._pos = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, value):
+        with self.lock:
+            self._data[self._pos] = value
+            self._data[self._pos + self.capacity] = value
+            self._pos = (self._pos + 1) % self.capacity
+            self._count = min(self._count + 1, self.capacity)
+
+    def latest(self, n, newest_first=True):
+        """
+        View of the last n values. newest_first=True gives lag order (lag_1, lag_2, ...).
+        """
+        with self.lock:
+            if n > self._count:
+                raise ValueError(f"Only {self._count} values buffered, {n} requested")
+            end = self._pos + self.capacity
+            window = self._data[end - n:end]
+            return window[::-1] if newest_first else window
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import threading
+import time
+import traceback
+from source.metrics import inc
+
+SNAPSHOT_INTERVAL = float(os.getenv('SNAPSHOT_INTERVAL', 60))
+MAX_SNAPSHOTS = int(os.getenv('MAX_SNAPSHOTS', 512))
+
+_lock = threading.Lock()
+_snapshots = {}
+_scheduler = None
+
+
+def tracked_pairs(value=None):
+    """Parse "ETH/USD,BTC/EUR" (default: the TRACKED_PAIRS env var) into a list of (symbol, currency)."""
+    value = os.getenv('TRACKED_PAIRS', '') if value is None else value
+    pairs = []
+    for item in value.split(','):
+        if '/' in item:
+            symbol, currency = item.strip().split('/', 1)
+            pairs.append((symbol.strip(), currency.strip()))
+    return pairs
+
+
+def put(key, body, fingerprint):
+    """
+    Store a pre-serialized response body for `key`, valid while the data fingerprint matches.
+    The ETag is derived from the bytes, and Last-Modified only moves when the bytes change.
+    """
+    etag = hashlib.sha1(body).hexdigest()
+    with _lock:
+        previous = _snapshots.get(key)
+        last_modified = previous['last_modified'] if previous and previous['etag'] == etag else time.time()
+        snapshot = {
+            'body': body,
+            'etag': etag,
+            'last_modified': last_modified,
+            'fingerprint': fingerprint,
+        }
+        _snapshots.pop(key, None)
+        _snapshots[key] = snapshot
+        while len(_snapshots) > MAX_SNAPSHOTS:
+            _snapshots.pop(next(iter(_snapshots)))
+    return snapshot
+
+
+def get(key, fingerprint):
+    """Return the snapshot for `key` if it was built from data with this fingerprint, else None."""
+    with _lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is None or fingerprint is None or snapshot['fingerprint'] != fingerprint:
+            snapshot = None
+    inc('snapshot_requests_total', result='miss' if snapshot is None else 'hit')
+    return snapshot
+
+
+def invalidate(symbol=None, currency=None):
+    """Drop every snapshot, or only those of one pair. Keys are (kind, symbol, currency, ...)."""
+    with _lock:
+        for key in list(_snapshots):
+            if (symbol is None or key[1] == symbol) and (currency is None or key[2] == currency):
+                del _snapshots[key]
+
+
+class _Scheduler:
+    """
+    Background thread that calls refresh(symbol, currency) for every tracked pair whose data
+    fingerprint changed since the last run. It wakes every `interval` seconds, or immediately
+    after notify().
+    """
+
+    def __init__(self, pairs, refresh, fingerprint, interval):
+        self.pairs = list(pairs)
+        self.refresh = refresh
+        self.fingerprint = fingerprint
+        self.interval = interval
+        self.seen = {}
+        self.wake = threading.Event()
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._loop, name='snapshot-scheduler', daemon=True)
+
+    def _loop(self):
+        while not self.stop.is_set():
+            self.wake.clear()
+            for symbol, currency in self.pairs:
+                if self.stop.is_set():
+                    return
+                fingerprint = self.fingerprint(symbol, currency)
+                if fingerprint is None or self.seen.get((symbol, currency)) == fingerprint:
+                    continue
+                try:
+                    self.refresh(symbol, currency)
+                    self.seen[(symbol, currency)] = fingerprint
+                    inc('snapshot_refreshes_total', status='done')
+                except Exception:
+                    print(f"Snapshot refresh for {symbol}/{currency} failed: {traceback.format_exc()}")
+                    inc('snapshot_refreshes_total', status='failed')
+            self.wake.wait(self.interval)
+
+
+def start_scheduler(pairs, refresh, fingerprint, interval=None):
+    """
+    Start the snapshot scheduler (once per process). `fingerprint(symbol, currency)` returns a
+    cheap identifier of the pair's current data, or None while it has no data.
+    """
+    global _scheduler
+    with _lock:
+        if _scheduler is not None:
+            return _scheduler
+        _scheduler = _Scheduler(pairs, refresh, fingerprint, SNAPSHOT_INTERVAL if interval is None else interval)
+    _scheduler.thread.start()
+    return _scheduler
+
+
+def notify():
+    """Ask the scheduler to check the tracked pairs now, e.g. right after new candles were stored."""
+    if _scheduler is not None:
+        _scheduler.wake.set()
+
+
+def stop_scheduler():
+    global _scheduler
+    with _lock:
+        scheduler, _scheduler = _scheduler, None
+    if scheduler is not None:
+        scheduler.stop.set()
+        scheduler.wake.set()
+        scheduler.thread.join()
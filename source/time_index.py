@@ -0,0 +1,113 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+from source.candle_store import is_store, read_arrays
+from source.jobs import file_fingerprint
+
+MODES = ('exact', 'nearest', 'asof')
+
+_lock = threading.Lock()
+_indexes = {}
+
+
+class TimeIndex:
+    """
+    Sorted epoch-second timestamps and close prices of one series, answering point lookups
+    by binary search.
+
+    - exact: the candle at exactly that time
+    - nearest: the closest candle on either side (ties go to the earlier one)
+    - asof: the last candle at or before that time
+    """
+
+    def __init__(self, times, close):
+        self.times = times
+        self.close = close
+
+    def __len__(self):
+        return len(self.times)
+
+    def locate(self, query_seconds, mode='exact'):
+        """
+        Row positions for an array of epoch-second query times, with -1 where nothing matches.
+        """
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        query_seconds = np.atleast_1d(np.asarray(query_seconds, dtype=np.int64))
+        n = len(self.times)
+        if n == 0:
+            return np.full(len(query_seconds), -1, dtype=np.int64)
+
+        right = np.searchsorted(self.times, query_seconds, side='right')
+        asof = right - 1
+        if mode == 'asof':
+            return asof
+
+        if mode == 'exact':
+            found = (asof >= 0) & (self.times[np.clip(asof, 0, n - 1)] == query_seconds)
+            return np.where(found, asof, -1)
+
+        after = np.clip(right, 0, n - 1)
+        before = np.clip(asof, 0, n - 1)
+        take_after = (asof < 0) | ((right < n) & (self.times[after] - query_seconds < query_seconds - self.times[before]))
+        return np.where(take_after, after, before)
+
+    def range(self, start_seconds=None, end_seconds=None):
+        """Slice of rows with start <= time <= end (either bound may be None)."""
+        lo = 0 if start_seconds is None else int(np.searchsorted(self.times, start_seconds, side='left'))
+        hi = len(self.times) if end_seconds is None else int(np.searchsorted(self.times, end_seconds, side='right'))
+        return slice(lo, max(lo, hi))
+
+
+def _load(path):
+    if is_store(path):
+        arrays = read_arrays(path)
+        return TimeIndex(arrays['time'], arrays['close'])
+
+    df = pd.read_csv(path, usecols=['time', 'close']).dropna()
+    times = to_epoch_seconds(df['time'])
+    close = df['close'].to_numpy(dtype=np.float64)
+    order = np.argsort(times, kind='stable')
+    times, close = times[order], close[order]
+    # Keep the last row of any duplicated timestamp
+    keep = np.append(times[1:] != times[:-1], True)
+    return TimeIndex(times[keep], close[keep])
+
+
+def get_index(path):
+    """
+    Return the TimeIndex for a CSV file or candle store series. It is built once and rebuilt
+    only when the file's size or mtime changes, so a lookup costs a stat call plus a binary search.
+    """
+    key = os.path.abspath(path)
+    fingerprint = file_fingerprint(path)
+    if fingerprint is None:
+        raise FileNotFoundError(path)
+    with _lock:
+        entry = _indexes.get(key)
+    if entry is not None and entry[0] == fingerprint:
+        return entry[1]
+
+    index = _load(path)
+    with _lock:
+        _indexes[key] = (fingerprint, index)
+    return index
+
+
+def to_epoch_seconds(values):
+    """
+    Parse timestamps into int64 epoch seconds. A Series (a file column) is assumed to use one
+    format; other inputs are user queries and may mix formats. Naive times are taken as UTC.
+    """
+    if isinstance(values, pd.Series):
+        parsed = pd.to_datetime(values, utc=True)
+    else:
+        parsed = pd.to_datetime(pd.Series(np.atleast_1d(values)), format='mixed', utc=True)
+    parsed = parsed.dt.tz_convert(None)
+    return parsed.to_numpy(dtype='datetime64[s]').astype(np.int64)
+
+
+def clear():
+    with _lock:
+        _indexes.clear()
@@ -0,0 +1,129 @@
+import asyncio
+import queue
+import threading
+import time
+
+import pytest
+from aiohttp import web
+
+from source import live_client, price_hub
+from source.live_client import LiveClient, Tick
+
+
+class FakeCryptoCompare:
+    """Local pricemulti server running on its own event loop thread; records every request."""
+
+    def __init__(self, prices):
+        self.prices = prices
+        self.requests = []
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    async def pricemulti(self, request):
+        self.requests.append(dict(request.query))
+        symbols = request.query['fsyms'].split(',')
+        currencies = request.query['tsyms'].split(',')
+        return web.json_response({
+            symbol: {currency: self.prices[symbol][currency] for currency in currencies if currency in self.prices.get(symbol, {})}
+            for symbol in symbols if symbol in self.prices
+        })
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_get('/data/pricemulti', self.pricemulti)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, '127.0.0.1', 0)
+        await site.start()
+        return site._server.sockets[0].getsockname()[1]
+
+    def start(self):
+        self.thread.start()
+        port = asyncio.run_coroutine_threadsafe(self._start(), self.loop).result(5)
+        self.url = f'http://127.0.0.1:{port}'
+        return self
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+
+
+@pytest.fixture
+def server():
+    fake = FakeCryptoCompare({'ETH': {'USD': 3000.5, 'EUR': 2800.0}, 'BTC': {'USD': 60000.0}}).start()
+    yield fake
+    fake.stop()
+
+
+def test_fetch_prices_batches_pairs_into_one_request(server):
+    async def run():
+        async with LiveClient('key', [('ETH', 'USD'), ('BTC', 'USD'), ('ETH', 'EUR')], base_url=server.url) as client:
+            return await client.fetch_prices()
+
+    ticks = asyncio.run(run())
+
+    assert len(server.requests) == 1
+    assert server.requests[0]['fsyms'] == 'ETH,BTC'
+    assert server.requests[0]['tsyms'] == 'USD,EUR'
+    assert [(t.symbol, t.currency, t.price) for t in ticks] == [('ETH', 'USD', 3000.5), ('BTC', 'USD', 60000.0), ('ETH', 'EUR', 2800.0)]
+    assert all(isinstance(t, Tick) for t in ticks)
+
+
+def test_stream_polls_on_a_fixed_grid_until_stopped(server):
+    stop = threading.Event()
+
+    async def run():
+        polls = []
+        async with LiveClient(None, [('ETH', 'USD')], interval=0.05, base_url=server.url) as client:
+            async for ticks in client.stream(stop=stop):
+                polls.append(asyncio.get_running_loop().time())
+                if len(polls) == 4:
+                    stop.set()
+        return polls
+
+    polls = asyncio.run(run())
+
+    assert len(polls) == 4
+    assert len(server.requests) == 4
+    assert 'api_key' not in server.requests[0]
+    # Poll k is due at start + k * interval, so the total span does not grow with latency
+    assert polls[-1] - polls[0] == pytest.approx(0.15, abs=0.04)
+
+
+def test_hub_polls_every_subscribed_pair_with_one_client(server, monkeypatch):
+    monkeypatch.setattr(live_client, 'API_BASE_URL', server.url)
+    eth = price_hub.subscribe('key', 'ETH', 'USD', interval=0.05)
+    btc = price_hub.subscribe('key', 'BTC', 'USD', interval=0.05)
+    try:
+        eth_tick = eth.get(timeout=2)
+        btc_tick = btc.get(timeout=2)
+    finally:
+        price_hub.unsubscribe('ETH', 'USD', eth)
+        price_hub.unsubscribe('BTC', 'USD', btc)
+
+    assert eth_tick['USD'] == 3000.5 and eth_tick['symbol'] == 'ETH'
+    assert btc_tick['USD'] == 60000.0 and btc_tick['symbol'] == 'BTC'
+    assert any(r['fsyms'] == 'ETH,BTC' for r in server.requests)
+    assert price_hub.hub_stats() == {}
+
+    # The hub stops once the last subscriber leaves
+    time.sleep(0.2)
+    seen = len(server.requests)
+    time.sleep(0.2)
+    assert len(server.requests) == seen
+
+
+def test_hub_drops_a_full_subscriber(server, monkeypatch):
+    monkeypatch.setattr(live_client, 'API_BASE_URL', server.url)
+    slow = price_hub.subscribe('key', 'ETH', 'USD', interval=0.02, maxsize=1)
+    try:
+        deadline = time.time() + 2
+        while price_hub.hub_stats() and time.time() < deadline:
+            time.sleep(0.02)
+        assert price_hub.hub_stats() == {}
+        assert slow.get_nowait() is None
+        with pytest.raises(queue.Empty):
+            slow.get_nowait()
+    finally:
+        price_hub.unsubscribe('ETH', 'USD', slow)